@@ -14,9 +14,10 @@ from pathlib import Path
 import asyncpg
 import sanic
 from sanic import Sanic
-from sanic_compress import Compress
 from spf import SanicPluginsFramework
 
+from .compress import AppCompress
+
 __version__ = "1.0.0"
 APP_NAME = "Noiseblend"
 
@@ -60,7 +61,7 @@ sentry_sdk.init(
 )
 
 app = Sanic(log_config=log_config)
-Compress(app)
+AppCompress(app)
 spf = SanicPluginsFramework(app)
 app.static("/favicon.ico", str(ROOT_DIR / "favicon.ico"), name="favicon")
 
@@ -4,8 +4,12 @@ from arq import Actor as BaseActor
 from arq.utils import RedisSettings, create_pool_lenient
 
 from .. import DBPOOL, config
+from ..overrides import close_shared_connector
 
 REDIS = config.worker.redis or config.redis
+REDIS_SETTINGS = RedisSettings(
+    pool_maxsize=REDIS.pool.maxsize, pool_minsize=REDIS.pool.minsize, **REDIS.auth
+)
 
 
 class Actor(BaseActor):
@@ -17,11 +21,7 @@ class Actor(BaseActor):
     )
 
     def __init__(self, *args, with_redis_pool=False, **kwargs):
-        self.redis_settings = RedisSettings(
-            pool_maxsize=REDIS.pool.maxsize,
-            pool_minsize=REDIS.pool.minsize,
-            **REDIS.auth
-        )
+        self.redis_settings = REDIS_SETTINGS
         self.with_redis_pool = with_redis_pool
         self.dbpool = DBPOOL
         super().__init__(*args, **kwargs)
@@ -37,3 +37,4 @@ class Actor(BaseActor):
             Actor.local_redis.close()
             await Actor.local_redis.wait_closed()
             Actor.local_redis = None
+        await close_shared_connector()
@@ -0,0 +1,73 @@
+import asyncio
+
+from first import first
+
+from .. import config, logger
+
+DEVICES = config.worker.devices
+MIN_POLLING = DEVICES.min_polling or 0.5
+MAX_POLLING = DEVICES.max_polling or 3
+BACKOFF = DEVICES.backoff or 1.5
+
+
+class DeviceDiscovery:
+    services = {}
+
+    def __init__(self, spotify):
+        self.spotify = spotify
+        self.waiters = {}
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    @classmethod
+    def for_user(cls, spotify):
+        service = cls.services.get(spotify.user_id)
+        if not service:
+            service = cls.services[spotify.user_id] = cls(spotify)
+        return service
+
+    async def wait_for_new_device(self, known_device_ids, timeout):
+        future = asyncio.get_event_loop().create_future()
+        self.waiters[future] = set(known_device_ids)
+        self.wakeup.set()
+        if not self.task:
+            self.task = asyncio.ensure_future(self.run())
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiters.pop(future, None)
+            if not self.waiters:
+                self.stop()
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.services.get(self.spotify.user_id) is self:
+            del self.services[self.spotify.user_id]
+
+    def publish(self, device_ids):
+        for future, known_device_ids in list(self.waiters.items()):
+            new_device_ids = device_ids - known_device_ids
+            if new_device_ids and not future.done():
+                future.set_result(first(new_device_ids))
+
+    async def run(self):
+        polling = MIN_POLLING
+        while self.waiters:
+            if self.wakeup.is_set():
+                self.wakeup.clear()
+                polling = MIN_POLLING
+
+            try:
+                self.publish({d.id for d in await self.spotify.devices()})
+            except Exception as exc:
+                logger.exception(exc)
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), polling)
+            except asyncio.TimeoutError:
+                polling = min(polling * BACKOFF, MAX_POLLING)
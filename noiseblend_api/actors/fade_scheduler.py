@@ -0,0 +1,191 @@
+import asyncio
+import socket
+import time
+from collections import defaultdict
+
+from .. import config, json, logger
+from ..db import cap
+
+FADES = config.worker.fades
+RESOLUTION = FADES.resolution or 0.5
+MAX_RETRIES = FADES.max_retries or 3
+LEASE = FADES.lease or 30
+WORKER_ID = FADES.worker_id or socket.gethostname()
+FADES_KEY = "noiseblend:fades"
+
+
+def fade_key(fade):
+    return f"{fade['user_id']}:{fade['device']}"
+
+
+def owner_key(worker_id):
+    return f"noiseblend:fades:owner:{worker_id}"
+
+
+def claim_key(key, owner):
+    return f"noiseblend:fades:claim:{key}:{owner}"
+
+
+def reached_limit(fade, volume):
+    if fade["step"] > 0:
+        return volume >= fade["limit"]
+    return volume <= fade["limit"]
+
+
+class FadeScheduler:
+    def __init__(self):
+        self.fades = {}
+        self.wheel = defaultdict(set)
+        self.current = 0
+        self.redis = None
+        self.client = None
+        self.task = None
+        self.lease_task = None
+
+    @staticmethod
+    def slot(due):
+        return int(due // RESOLUTION)
+
+    async def start(self, redis, client):
+        self.redis = redis
+        self.client = client
+        if self.task:
+            return
+
+        await self.renew_lease()
+        self.task = asyncio.ensure_future(self.run())
+        self.lease_task = asyncio.ensure_future(self.keep_lease())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        if self.lease_task:
+            self.lease_task.cancel()
+            self.lease_task = None
+            await self.redis.delete(owner_key(WORKER_ID))
+
+    async def renew_lease(self):
+        await self.redis.setex(owner_key(WORKER_ID), LEASE, 1)
+        claimed = await self.claim_orphans()
+        if claimed:
+            logger.info("Resuming %d volume fades", claimed)
+
+    async def keep_lease(self):
+        while True:
+            await asyncio.sleep(LEASE / 3)
+            try:
+                await self.renew_lease()
+            except Exception as exc:
+                logger.exception(exc)
+
+    async def claim_orphans(self):
+        now = time.time()
+        claimed = 0
+        fades = await self.redis.hgetall(FADES_KEY, encoding="utf-8")
+        for key, value in fades.items():
+            fade = json.loads(value)
+            owner = fade.get("owner")
+            if owner == WORKER_ID:
+                if key in self.fades:
+                    continue
+            elif await self.redis.exists(owner_key(owner)):
+                continue
+            elif not await self.redis.set(
+                claim_key(key, owner),
+                WORKER_ID,
+                expire=LEASE,
+                exist=self.redis.SET_IF_NOT_EXIST,
+            ):
+                continue
+
+            fade["due"] = max(fade["due"], now)
+            await self.add(fade)
+            claimed += 1
+        return claimed
+
+    def schedule(self, fade):
+        key = fade_key(fade)
+        self.fades[key] = fade
+        self.wheel[max(self.slot(fade["due"]), self.current)].add(key)
+
+    async def add(self, fade):
+        fade["owner"] = WORKER_ID
+        self.schedule(fade)
+        await self.redis.hset(FADES_KEY, fade_key(fade), json.dumps(fade))
+
+    async def remove(self, fade):
+        key = fade_key(fade)
+        if self.fades.get(key) is fade:
+            del self.fades[key]
+            await self.redis.hdel(FADES_KEY, key)
+
+    async def run(self):
+        self.current = self.slot(time.time())
+        while True:
+            now = self.slot(time.time())
+            keys = set()
+            while self.current <= now:
+                keys |= self.wheel.pop(self.current, set())
+                self.current += 1
+
+            for key in keys:
+                fade = self.fades.get(key)
+                if fade and self.slot(fade["due"]) <= now:
+                    asyncio.ensure_future(self.step(fade))
+
+            await asyncio.sleep(RESOLUTION)
+
+    async def step(self, fade):
+        try:
+            spotify = await self.client(fade["user_id"], fade["username"])
+            playback, device = await asyncio.gather(
+                spotify.current_playback(), spotify.get_device(device=fade["device"])
+            )
+            is_playing = bool(playback and playback.is_playing)
+            device_volume = int(device.volume_percent or 0)
+
+            if fade["force"]:
+                next_volume = device_volume + fade["step"]
+                done = not is_playing or reached_limit(fade, device_volume)
+            else:
+                next_volume = fade["volume"] + fade["step"]
+                done = (
+                    not is_playing
+                    or abs(device_volume - fade["volume"]) > abs(fade["step"]) + 2
+                    or reached_limit(fade, fade["volume"])
+                )
+
+            if done:
+                if device_volume <= abs(fade["step"]):
+                    await spotify.pause_playback()
+                await self.remove(fade)
+                return
+
+            await spotify.volume(cap(next_volume, 1, 100), device=fade["device"])
+            if self.fades.get(fade_key(fade)) is not fade:
+                return
+
+            fade["volume"] = next_volume
+            fade["retries"] = 0
+            fade["due"] = time.time() + fade["delay"]
+            await self.add(fade)
+        except Exception as exc:
+            logger.exception(exc)
+            await self.retry(fade)
+
+    async def retry(self, fade):
+        if self.fades.get(fade_key(fade)) is not fade:
+            return
+
+        fade["retries"] = fade.get("retries", 0) + 1
+        if fade["retries"] > MAX_RETRIES:
+            logger.warning("Giving up on volume fade %s", fade_key(fade))
+            await self.remove(fade)
+            return
+
+        fade["due"] = time.time() + fade["delay"]
+        await self.add(fade)
+
+
+FADE_SCHEDULER = FadeScheduler()
@@ -1,23 +1,28 @@
 import asyncio
+import time
+from collections import defaultdict
 from concurrent.futures import CancelledError
 
-from arq import concurrent
-from first import first
+from arq import concurrent, cron
 from spfy.exceptions import SpotifyDeviceUnavailableException
 
-from .. import logger
+from .. import config, json, logger
 from ..exceptions import NoDeviceAvailable
 from ..sql import SQL
 from .actor import Actor
+from .device_discovery import DeviceDiscovery
 from .spotify import SpotifyActor
 from .volume_fader import VolumeFader
 
 
+DEVICE_MAPPINGS_KEY = "noiseblend:pending-device-mappings"
+DEVICE_MAPPING_DELAY = config.worker.devices.mapping_delay or 5
+
+
 class Player(SpotifyActor):
-    def __init__(self, *args, retries=0, polling=0.5, timeout=10, **kwargs):
+    def __init__(self, *args, retries=0, timeout=10, **kwargs):
         super().__init__(*args, **kwargs)
         self.retries = retries
-        self.polling = polling
         self.timeout = timeout
         self.volume_fader = None
 
@@ -30,19 +35,11 @@ class Player(SpotifyActor):
         if real_device_id and real_device_id in devices:
             return real_device_id, False
 
-        steps = int(self.timeout / self.polling)
-        last_step = steps - 1
-
-        for step in range(steps):
-            current_devices = {d.id: d for d in await spotify.devices()}
-            new_device_ids = current_devices.keys() - devices.keys()
-
-            if new_device_ids:
-                new_device_id = first(new_device_ids)
-                return new_device_id, True
-
-            if step != last_step:
-                await asyncio.sleep(self.polling)
+        new_device_id = await DeviceDiscovery.for_user(spotify).wait_for_new_device(
+            devices.keys(), self.timeout
+        )
+        if new_device_id:
+            return new_device_id, True
 
         device = await spotify.get_device(only_active=False)
         return device and device.id, True
@@ -114,11 +111,60 @@ class Player(SpotifyActor):
                 await self.volume_fader.fade(user_id, username, device=device, **fade)
 
             if device_id and device_is_new:
-                await asyncio.sleep(5)
-                playback = await spotify.current_playback()
-                if playback and playback.is_playing:
-                    await self.dbpool.execute(
-                        SQL.map_device, {device_id: playback.device.id}, spotify.user_id
-                    )
+                redis = await self.get_redis()
+                await redis.zadd(
+                    DEVICE_MAPPINGS_KEY,
+                    time.time() + DEVICE_MAPPING_DELAY,
+                    json.dumps(
+                        {
+                            "user_id": user_id,
+                            "username": username,
+                            "device_id": device_id,
+                        }
+                    ),
+                )
+        except CancelledError:
+            pass
+
+    async def confirm_device_mapping(self, pending):
+        try:
+            spotify = await self.spotify(pending["user_id"], pending["username"])
+            playback = await spotify.current_playback()
+        except Exception as exc:
+            logger.exception(exc)
+            return None
+
+        if playback and playback.is_playing:
+            return {pending["device_id"]: playback.device.id}
+        return None
+
+    @cron(second=set(range(0, 60, 5)), dft_queue=Actor.LOW_QUEUE)
+    async def map_devices(self):
+        try:
+            redis = await self.get_redis()
+            now = time.time()
+            tr = redis.multi_exec()
+            due = tr.zrangebyscore(DEVICE_MAPPINGS_KEY, max=now)
+            tr.zremrangebyscore(DEVICE_MAPPINGS_KEY, max=now)
+            await tr.execute()
+
+            pending = [json.loads(p) for p in await due]
+            if not pending:
+                return
+
+            mappings = await asyncio.gather(
+                *[self.confirm_device_mapping(p) for p in pending]
+            )
+            user_mappings = defaultdict(dict)
+            for p, mapping in zip(pending, mappings):
+                if mapping:
+                    user_mappings[p["user_id"]].update(mapping)
+
+            if user_mappings:
+                await self.dbpool.execute(
+                    SQL.map_devices,
+                    list(user_mappings.keys()),
+                    [json.dumps(m) for m in user_mappings.values()],
+                )
         except CancelledError:
             pass
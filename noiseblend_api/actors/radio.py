@@ -3,16 +3,61 @@ import asyncio
 from arq import concurrent
 from fuzzywuzzy import fuzz
 
-from .. import logger
-from ..helpers import fuzzysearch, get_tuneable_attributes, user_disliked_artists
+from .. import config, logger
+from ..cache import LRUCache
+from ..genres import genre_seeds
+from ..helpers import get_dislikes, get_tuneable_attributes
 from .actor import Actor
 from .spotify import SpotifyActor
 
+SEARCH = config.cache.search
+SEARCH_CACHE = LRUCache(size=SEARCH.size or 5000, ttl=SEARCH.ttl or 86400)
+MISSING = object()
+
+
+def normalize(query):
+    return " ".join((query or "").lower().split())
+
 
 class Radio(SpotifyActor):
+    search_semaphore = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    async def search(self, request):
+        if not Radio.search_semaphore:
+            Radio.search_semaphore = asyncio.Semaphore(SEARCH.concurrency or 5)
+        async with Radio.search_semaphore:
+            return await request
+
+    async def resolve_artist(self, spotify, name):
+        key = ("artist", normalize(name))
+        artist = SEARCH_CACHE.get(key, MISSING)
+        if artist is MISSING:
+            response = await self.search(spotify.search_artist(name, limit=1))
+            artist = (
+                response.artists["items"][0] if response.artists.total > 0 else None
+            )
+            SEARCH_CACHE.set(key, artist)
+        return artist
+
+    async def resolve_track(self, spotify, name, artist=None):
+        key = ("track", normalize(name), normalize(artist))
+        track = SEARCH_CACHE.get(key, MISSING)
+        if track is MISSING:
+            response = await self.search(
+                spotify.search_track(name, limit=(10 if artist else 1))
+            )
+            tracks = response.tracks["items"]
+            track = None
+            if len(tracks) == 1 or (tracks and not artist):
+                track = tracks[0]
+            elif tracks:
+                track = self.match_artist(tracks, artist)
+            SEARCH_CACHE.set(key, track)
+        return track
+
     async def filter_tracks(self, spotify, tracks, filter_explicit=False):
         tracks = [
             t
@@ -21,7 +66,7 @@ class Radio(SpotifyActor):
         ]
         logger.debug("Playable: %d tracks", len(tracks))
 
-        disliked_artists = set(await user_disliked_artists(spotify, conn=self.dbpool))
+        disliked_artists = (await get_dislikes(spotify, conn=self.dbpool)).artists
         tracks = [
             t for t in tracks if not set(a.id for a in t.artists) & disliked_artists
         ]
@@ -35,28 +80,19 @@ class Radio(SpotifyActor):
 
     @staticmethod
     def match_artist(tracks, artist):
+        name = normalize(artist)
+        resolved = SEARCH_CACHE.get(("artist", name))
+        for track in tracks:
+            for track_artist in track.artists:
+                if normalize(track_artist.name) == name or (
+                    resolved and track_artist.id == resolved.id
+                ):
+                    return track
+
         return max(
             tracks, key=lambda t: max(fuzz.ratio(artist, a.name) for a in t.artists)
         )
 
-    def get_tracks(self, tracks_by_artist, track_responses):
-        matched_tracks = []
-        for r, t in zip(track_responses, tracks_by_artist):
-            tracks = r.tracks["items"]
-            if not tracks:
-                continue
-
-            if len(t) > 1:
-                artist = t[1]
-            else:
-                artist = None
-
-            if len(tracks) == 1 or not artist:
-                matched_tracks.append(tracks[0])
-            else:
-                matched_tracks.append(self.match_artist(tracks, artist))
-        return matched_tracks
-
     # pylint: disable=too-many-locals
     @concurrent(Actor.HIGH_QUEUE, unique=True, expire_seconds=20)
     async def play_radio(
@@ -78,15 +114,12 @@ class Radio(SpotifyActor):
         ]
 
         artist_requests = [
-            spotify.search_artist(a, limit=1) for a in (artist_names or [])
-        ]
-        track_requests = [
-            spotify.search_track(t[0], limit=(1 if len(t) == 1 else 10))
-            for t in tracks_by_artist
+            self.resolve_artist(spotify, a) for a in (artist_names or [])
         ]
+        track_requests = [self.resolve_track(spotify, *t) for t in tracks_by_artist]
         genre_requests = []
         if genre_names:
-            genre_requests = [spotify.recommendation_genre_seeds()]
+            genre_requests = [genre_seeds(spotify)]
 
         responses = await asyncio.gather(
             *[*artist_requests, *track_requests, *genre_requests]
@@ -99,14 +132,11 @@ class Radio(SpotifyActor):
         artist_responses = artist_and_track_responses[: len(artist_requests)]
         track_responses = artist_and_track_responses[len(artist_requests) :]
 
-        artists = [
-            r.artists["items"][0] for r in artist_responses if r.artists.total > 0
-        ]
-        tracks = self.get_tracks(tracks_by_artist, track_responses)
+        artists = [a for a in artist_responses if a]
+        tracks = [t for t in track_responses if t]
         genres = []
         if genre_names:
-            genre_set = set(genres_response.genres)
-            genres = list({fuzzysearch(name, genre_set) for name in genre_names})
+            genres = list({genres_response.match(name) for name in genre_names})
 
         artist_names = list({a.name for a in artists})
         track_names = list(
@@ -1,34 +1,92 @@
+import asyncio
+
 from .. import config
-from ..overrides import AppSpotify
+from ..cache import LRUCache, async_lru, log_cache_info
+from ..genres import genre_seeds
+from ..helpers import listen_for_dislike_invalidations
+from ..overrides import CONNECTION_STATS, AppSpotify, close_session
 from .actor import Actor
 
+CLIENTS = LRUCache(
+    size=config.cache.worker_clients.size or 1000,
+    ttl=config.cache.worker_clients.idle_ttl or 900,
+    sliding=True,
+)
+CLIENTS_SWEEP_INTERVAL = config.cache.worker_clients.sweep_interval or 60
+
+
+async def sweep_clients():
+    while True:
+        await asyncio.sleep(CLIENTS_SWEEP_INTERVAL)
+        CLIENTS.expire()
+
+
+def client_key(user_id, username, **_kwargs):
+    return (user_id, username)
+
+
+@async_lru(
+    key=client_key, evict_callback=close_session, cache=CLIENTS, single_flight=True
+)
+async def client(user_id, username, redis=None, dbpool=None):
+    spotify = AppSpotify(
+        user_id=user_id,
+        username=username,
+        client_id=config.spotify.client_id,
+        client_secret=config.spotify.client_secret,
+        redirect_uri=config.spotify.redirect_uri,
+        redis=redis,
+        dbpool=dbpool,
+    )
+    await spotify.authenticate_user_pg(scope=config.spotify.scope)
+    return spotify
+
 
 class SpotifyActor(Actor):
-    def __init__(self, *args, **kwargs):
-        self.clients = {}
-        super().__init__(*args, **kwargs)
+    stats_task = None
+    dislikes_listener = None
+    sweep_task = None
+
+    async def startup(self):
+        await super().startup()
+        if self.is_shadow and not SpotifyActor.stats_task:
+            SpotifyActor.stats_task = asyncio.ensure_future(
+                log_cache_info(
+                    {
+                        "worker_clients": client.cache_info,
+                        "genre_seeds": genre_seeds.cache_info,
+                        "http_connections": CONNECTION_STATS.to_dict,
+                    },
+                    config.cache.stats.interval or 600,
+                )
+            )
+        if self.is_shadow and not SpotifyActor.sweep_task:
+            SpotifyActor.sweep_task = asyncio.ensure_future(sweep_clients())
+        if self.is_shadow and not SpotifyActor.dislikes_listener:
+            SpotifyActor.dislikes_listener = asyncio.ensure_future(
+                listen_for_dislike_invalidations(await self.get_redis())
+            )
 
-    # @async_lru(size=10, evict_callback=close_session)
     async def spotify(self, user_id, username):
-        if (user_id, username) in self.clients:
-            return self.clients[(user_id, username)]
-
-        spotify = AppSpotify(
-            user_id=user_id,
-            username=username,
-            client_id=config.spotify.client_id,
-            client_secret=config.spotify.client_secret,
-            redirect_uri=config.spotify.redirect_uri,
+        return await client(
+            user_id,
+            username,
             redis=Actor.local_redis or self.redis,
             dbpool=self.dbpool,
         )
-        await spotify.authenticate_user_pg(scope=config.spotify.scope)
-        self.clients[(user_id, username)] = spotify
-        return spotify
 
     async def shutdown(self):
+        if SpotifyActor.stats_task:
+            SpotifyActor.stats_task.cancel()
+            SpotifyActor.stats_task = None
+        if SpotifyActor.sweep_task:
+            SpotifyActor.sweep_task.cancel()
+            SpotifyActor.sweep_task = None
+        if SpotifyActor.dislikes_listener:
+            SpotifyActor.dislikes_listener.cancel()
+            SpotifyActor.dislikes_listener = None
+        clients = [spotify for spotify, _ in CLIENTS.data.values()]
+        CLIENTS.clear()
+        for spotify in clients:
+            await close_session(spotify)
         await super().shutdown()
-        for spotify in self.clients.values():
-            if spotify.session:
-                await spotify.session.close()
-        self.clients.clear()
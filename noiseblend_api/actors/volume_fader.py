@@ -1,11 +1,13 @@
 import asyncio
+import time
 from concurrent.futures import CancelledError
 
 from arq import concurrent
 from first import first
-from spfy.constants import VolumeBackend
 
 from ..exceptions import NoDeviceAvailable
+from .actor import Actor
+from .fade_scheduler import FADE_SCHEDULER
 from .spotify import SpotifyActor
 
 
@@ -19,6 +21,16 @@ class VolumeFader(SpotifyActor):
         self.polling = polling
         self.timeout = timeout
 
+    async def startup(self):
+        await super().startup()
+        if self.is_shadow:
+            redis = Actor.local_redis or await self.get_redis()
+            await FADE_SCHEDULER.start(redis, self.spotify)
+
+    async def shutdown(self):
+        await FADE_SCHEDULER.stop()
+        await super().shutdown()
+
     async def get_playing_device(self, spotify):
         playback, devices = await asyncio.gather(
             spotify.current_playback(), spotify.devices()
@@ -39,7 +51,7 @@ class VolumeFader(SpotifyActor):
             if step != last_step:
                 await asyncio.sleep(self.polling)
 
-    @concurrent(unique=True, timeout_seconds=2500, expire_seconds=60)
+    @concurrent(unique=True, timeout_seconds=60, expire_seconds=60)
     async def fade(
         self,
         user_id,
@@ -68,21 +80,26 @@ class VolumeFader(SpotifyActor):
             elif step < 0 and limit >= start:
                 limit = 0
 
-            if abs(limit - start) <= step * 2:
+            if not step or abs(limit - start) <= abs(step) * 2:
                 return
 
             if device and not isinstance(device, str):
                 device = device.id
 
-            await spotify.fade(
-                limit=limit,
-                start=start,
-                seconds=seconds,
-                backend=VolumeBackend.SPOTIFY,
-                step=step,
-                device=device,
-                blocking=True,
-                force=force,
+            delay = seconds / ((limit - start) / step)
+            await spotify.volume(cap(start, 1, 100), device=device)
+            await FADE_SCHEDULER.add(
+                {
+                    "user_id": user_id,
+                    "username": username,
+                    "device": device,
+                    "volume": start,
+                    "limit": limit,
+                    "step": step,
+                    "force": force,
+                    "delay": delay,
+                    "due": time.time() + delay,
+                }
             )
         except CancelledError:
             pass
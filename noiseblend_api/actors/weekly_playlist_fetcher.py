@@ -1,7 +1,9 @@
+import time
 from concurrent.futures import CancelledError
 
 from arq import cron
 
+from ..catalog import CATALOG_CHANNEL, CATALOG_VERSION_KEY
 from ..overrides import AppSpotify
 from .actor import Actor
 
@@ -20,5 +22,11 @@ class WeeklyPlaylistFetcher(Actor):
             )
             await spotify.authenticate_server_pg(conn=self.dbpool)
             await spotify.fetch_playlists_pg(conn=self.dbpool)
+
+            version = str(int(time.time()))
+            tr = (await self.get_redis()).multi_exec()
+            tr.set(CATALOG_VERSION_KEY, version)
+            tr.publish(CATALOG_CHANNEL, version)
+            await tr.execute()
         except CancelledError:
             pass
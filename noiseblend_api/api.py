@@ -3,6 +3,7 @@ import asyncio
 
 import signal
 import ujson
+from arq.utils import create_pool_lenient
 from base64 import b64decode
 from collections import OrderedDict
 from datetime import timedelta
@@ -15,28 +16,41 @@ from spfy.cache import Artist, Country, Image, User
 from spfy.constants import AudioFeature, VolumeBackend
 from spfy.exceptions import SpotifyDeviceUnavailableException
 from spfy.sql import SQL as SPFY_SQL
-from stringcase import camelcase, snakecase
 from uuid import uuid4
 
-from . import app, config, logger, spf
+from . import DBPOOL, app, config, logger, spf
+from .actors.actor import REDIS_SETTINGS
+from .cache import log_cache_info
+from .catalog import CATALOG
 from .constants import APP_USER_FLAGS
 from .db import cap, gentoken
+from .genres import genre_seeds
 from .helpers import (
+    ARTIST_CACHE,
+    DISLIKES_CACHE,
+    RECOMMENDATION_CACHE,
+    TUNER_DEBOUNCE,
     add_image,
     assign_audio_features,
     assign_best_image,
     assign_images,
+    get_artists,
+    get_audio_features,
     get_devices_and_playback,
+    get_dislikes,
     get_playlist_description,
     get_tuneable_attributes,
     get_user_dict,
     plural,
+    quantize_attributes,
+    recommendation_key,
+    refresh_dislikes,
     seconds_until_next_playlist_fetch,
     start_playback,
-    user_disliked_artists,
     with_cache,
     with_cache_invalidation,
 )
+from .overrides import CONNECTION_STATS, client_in_use, close_shared_connector
 from .plugins import (
     arq,
     asyncdb,
@@ -47,8 +61,11 @@ from .plugins import (
     snakecase_request,
     spotify_client,
 )
+from .plugins.spotify_client import TOKEN_USERS, client
+from .pollers import DevicePoller, StateSender
+from .response import PLAYLIST_ITEMS, should_stream, stream_camelcase_json
 from .sql import SQL
-from .transform import transform_keys
+from .transform import camelcase_key, snakecase_key, transform_keys
 from .worker import Worker
 
 
@@ -290,7 +307,7 @@ async def fetch_dislikes(request):
 
     if dislikes.get("artists"):
         dislikes["artists"] = [
-            a.to_dict() for a in await spotify.artists(dislikes["artists"])
+            a.to_dict() for a in await get_artists(spotify, dislikes["artists"])
         ]
         for artist in dislikes["artists"]:
             if artist["images"]:
@@ -439,13 +456,13 @@ async def top_artists(request):
     else:
         time_ranges = list(TimeRange)
 
-    dislikes = await spotify.get_dislikes_for_filtering()
+    dislikes = await get_dislikes(spotify, conn=conn)
     artists = await asyncio.gather(
         *[
             spotify.top_artists_pg(
                 time_range=tr,
                 ignore=ignore,
-                dislikes=dislikes,
+                dislikes=(dislikes.artists, dislikes.genres),
                 limit=limit if not _all else None,
             )
             for tr in time_ranges
@@ -497,9 +514,10 @@ async def top_genres(request):
         ]
 
         try:
-            await assign_images(
+            images = await assign_images(
                 genres, "name", "genre", image_width, image_height, conn=conn
             )
+            CATALOG.add_images("genre", images)
         except Exception as exc:
             logger.error("Error fetching images:")
             logger.exception(exc)
@@ -514,26 +532,22 @@ async def top_genres(request):
             }
         return genres
 
-    query_args = {
-        "playlist_query": SQL.genre_playlists,
-        "singular": "genre",
-        "plural": "genres",
-    }
-
     if not _all:
         if not time_range:
             time_range = await conn.fetchval(SQL.user_genre_time_range, spotify.user_id)
 
-        query = SQL.item_playlists.format(limit=limit, **query_args)
         time_ranges = [time_range or TimeRange.MEDIUM_TERM]
     else:
-        query = SQL.all_item_playlists.format(**query_args)
+        limit = None
         time_ranges = list(TimeRange)
 
-    dislikes = await spotify.get_dislikes_for_filtering(conn)
+    dislikes = await get_dislikes(spotify, conn=conn)
     genre_requests = [
         spotify.top_genres_pg(
-            time_range=tr, ignore=ignore, conn=conn, dislikes=dislikes
+            time_range=tr,
+            ignore=ignore,
+            conn=conn,
+            dislikes=(dislikes.artists, dislikes.genres),
         )
         for tr in time_ranges
     ]
@@ -541,13 +555,18 @@ async def top_genres(request):
     if not any(genres):
         return [] if not _all else {}
 
-    playlists = [await conn.fetch(query, g, image_width, image_height) for g in genres]
+    playlists = [
+        CATALOG.item_playlists(
+            "genre", g, limit=limit, width=image_width, height=image_height
+        )
+        for g in genres
+    ]
     genres = await asyncio.gather(*[get_genres(p) for p in playlists])
 
     if _all:
         genres = {tr.value.lower(): g for tr, g in zip(time_ranges, genres)}
         if time_range_arg:
-            return with_cache(genres)
+            return with_cache(genres, catalog=True)
         return genres
     return genres[0]
 
@@ -559,18 +578,13 @@ async def fetch_countries(request):
 
     _, ignore, limit, image_width, image_height, _all = parse_params(request)
 
-    query_args = {
-        "playlist_query": SQL.country_playlists_ignore,
-        "singular": "country",
-        "plural": "countries",
-    }
-    if not _all:
-        query = SQL.item_playlists.format(limit=limit, **query_args)
-    else:
-        query = SQL.all_item_playlists.format(**query_args)
-
-    playlists = await conn.fetch(
-        query, ignore, image_width, image_height, spotify.user_id
+    dislikes = await get_dislikes(spotify, conn=conn)
+    playlists = CATALOG.item_playlists(
+        "country",
+        CATALOG.items("country") - set(ignore) - dislikes.countries,
+        limit=None if _all else limit,
+        width=image_width,
+        height=image_height,
     )
     countries = {p["country"] for p in playlists}
     countries = [
@@ -583,9 +597,10 @@ async def fetch_countries(request):
     ]
 
     try:
-        await assign_images(
+        images = await assign_images(
             countries, "code", "country", image_width, image_height, conn=conn
         )
+        CATALOG.add_images("country", images)
     except Exception as exc:
         logger.error("Error fetching images:")
         logger.exception(exc)
@@ -600,7 +615,7 @@ async def fetch_countries(request):
         }
 
     if _all:
-        return with_cache(countries)
+        return with_cache(countries, catalog=True)
     return countries
 
 
@@ -621,31 +636,26 @@ async def fetch_cities(request):
         )
         country = preferred_country or user_country
 
-    query_args = {
-        "playlist_query": SQL.city_playlists_ignore,
-        "singular": "city",
-        "plural": "cities",
-    }
-    if not _all:
-        query = SQL.item_playlists.format(limit=limit, **query_args)
-    else:
-        query = SQL.all_item_playlists.format(**query_args)
-
-    playlists = await conn.fetch(
-        query, ignore, image_width, image_height, country, spotify.user_id
+    dislikes = await get_dislikes(spotify, conn=conn)
+    playlists = CATALOG.item_playlists(
+        "city",
+        CATALOG.country_cities(country) - set(ignore) - dislikes.cities,
+        limit=None if _all else limit,
+        width=image_width,
+        height=image_height,
+        country=country,
     )
     cities = [
         {"playlist": dict(playlist), "name": playlist["city"]} for playlist in playlists
     ]
     if with_countries:
-        countries = [
-            dict(c) for c in await conn.fetch("SELECT * FROM countries ORDER BY name")
-        ]
+        countries = CATALOG.countries
 
     try:
-        await assign_images(
+        images = await assign_images(
             cities, "name", "city", image_width, image_height, conn=conn
         )
+        CATALOG.add_images("city", images)
     except Exception as exc:
         logger.error("Error fetching images:")
         logger.exception(exc)
@@ -665,7 +675,7 @@ async def fetch_cities(request):
         response = cities
 
     if _all and country_arg:
-        return with_cache(response)
+        return with_cache(response, catalog=True)
     return response
 
 
@@ -689,7 +699,9 @@ async def recommendations(request):
     )
 
     if with_tuneable_attributes:
-        tracks["tracks"] = await assign_audio_features(spotify, tracks["tracks"])
+        tracks["tracks"] = await assign_audio_features(
+            spotify, tracks["tracks"], conn=request["dbpool"]
+        )
 
     return [t.to_dict() for t in tracks]
 
@@ -726,7 +738,15 @@ async def fetch_playlist(request):
             )
 
     if with_tuneable_attributes:
-        playlist = await assign_audio_features(spotify, playlist=playlist)
+        playlist = await assign_audio_features(
+            spotify, playlist=playlist, conn=request["dbpool"]
+        )
+
+    if should_stream(playlist, PLAYLIST_ITEMS):
+        max_age = None
+        if user in spotify.USER_LIST:
+            max_age = seconds_until_next_playlist_fetch()
+        return stream_camelcase_json(request, playlist, PLAYLIST_ITEMS, max_age=max_age)
 
     if user in spotify.USER_LIST:
         return with_cache(
@@ -796,7 +816,7 @@ async def save_playlist(request):
         await add_image(spotify, playlist.id, image, conn=conn)
 
     playlist = await spotify.user_playlist(playlist.id)
-    playlist = await assign_audio_features(spotify, playlist=playlist)
+    playlist = await assign_audio_features(spotify, playlist=playlist, conn=conn)
 
     return playlist.to_dict()
 
@@ -819,7 +839,7 @@ async def fetch_audio_features(request):
         tracks = await spotify.user_playlist_tracks(playlist_id, fields=fields)
         tracks = await tracks.all()
         tracks = [t.track.id for t in tracks if t.track]
-    audio_features = await spotify.audio_features(tracks=tracks)
+    audio_features = await get_audio_features(spotify, tracks, conn=request["dbpool"])
 
     audio_feature_keys = {f.value for f in AudioFeature}
     audio_features = {
@@ -828,11 +848,12 @@ async def fetch_audio_features(request):
         if a
     }
 
+    max_age = int(timedelta(days=7).total_seconds())
+    if should_stream(audio_features):
+        return stream_camelcase_json(request, audio_features, max_age=max_age)
+
     return with_cache(
-        audio_features,
-        without_user_id=True,
-        without_etag=True,
-        max_age=int(timedelta(days=7).total_seconds()),
+        audio_features, without_user_id=True, without_etag=True, max_age=max_age
     )
 
 
@@ -871,9 +892,12 @@ async def clone_playlist(request):
         await add_image(spotify, playlist.id, image, conn=conn)
 
     playlist = await spotify.user_playlist(playlist.id)
-    playlist = await assign_audio_features(spotify, playlist=playlist)
+    playlist = await assign_audio_features(spotify, playlist=playlist, conn=conn)
 
-    return playlist.to_dict()
+    playlist = playlist.to_dict()
+    if should_stream(playlist, PLAYLIST_ITEMS):
+        return stream_camelcase_json(request, playlist, PLAYLIST_ITEMS)
+    return playlist
 
 
 # pylint: disable=too-many-locals
@@ -902,7 +926,7 @@ async def filter_playlist(request):
     if filter_explicit:
         tracks = [t for t in tracks if not t.track.explicit]
     if filter_dislikes:
-        disliked_artists = set(await user_disliked_artists(spotify, conn=conn))
+        disliked_artists = (await get_dislikes(spotify, conn=conn)).artists
         tracks = [
             t
             for t in tracks
@@ -930,9 +954,12 @@ async def filter_playlist(request):
         await add_image(spotify, playlist.id, image, conn=conn)
 
     playlist = await spotify.user_playlist(playlist.id)
-    playlist = await assign_audio_features(spotify, playlist=playlist)
+    playlist = await assign_audio_features(spotify, playlist=playlist, conn=conn)
 
-    return playlist.to_dict()
+    playlist = playlist.to_dict()
+    if should_stream(playlist, PLAYLIST_ITEMS):
+        return stream_camelcase_json(request, playlist, PLAYLIST_ITEMS)
+    return playlist
 
 
 @app.post("/rename-playlist")
@@ -1044,9 +1071,9 @@ async def artist_details(request):
         raise InvalidUsage("Missing parameter `ids`")
     ids = ids.split(",")
 
-    artists = await spotify.artists(ids)
+    artists = await get_artists(spotify, ids)
     return with_cache(
-        [a.to_dict() for a in artists if a],
+        [a.to_dict() for a in artists],
         without_user_id=True,
         without_etag=True,
         max_age=int(timedelta(days=2).total_seconds()),
@@ -1090,6 +1117,9 @@ async def dislike(request):
             coros += [User.dislike_pg(conn, spotify, **{key: value}) for value in ids]
 
         await asyncio.gather(*coros)
+        await refresh_dislikes(
+            spotify, conn=conn, worker_redis=await request["player"].get_redis()
+        )
 
         invalidate_endpoints += [
             {"method": "GET", "user_id": spotify.user_id, "path": f"/{plural(key)}"}
@@ -1111,16 +1141,18 @@ async def dislike(request):
         ]
 
     elif current == "genre":
-        genre = (await spotify.artist(playback.item.artists[0].id)).genres[0]
+        artists = await get_artists(spotify, [playback.item.artists[0].id])
+        genre = artists[0].genres[0]
         coros.append(User.dislike_pg(conn, spotify, genre=genre))
     elif current == "genres":
-        artists = await asyncio.gather(
-            *[spotify.artist(a.id) for a in playback.item.artists]
-        )
+        artists = await get_artists(spotify, [a.id for a in playback.item.artists])
         genres = set(sum([a.genres for a in artists], []))
         coros += [User.dislike_pg(conn, spotify, genre=genre) for genre in genres]
 
     await asyncio.gather(*coros)
+    await refresh_dislikes(
+        spotify, conn=conn, worker_redis=await request["player"].get_redis()
+    )
 
     invalidate_endpoints.append(
         {"method": "GET", "user_id": spotify.user_id, "path": f"/{plural(current)}"}
@@ -1153,6 +1185,9 @@ async def like(request):
 
     values = {k: request.json[k] for k in valid_keys}
     await User.like_pg(conn, spotify.user_id, **values)
+    await refresh_dislikes(
+        spotify, conn=conn, worker_redis=await request["player"].get_redis()
+    )
 
     invalidate_endpoints = [
         {"method": "GET", "user_id": spotify.user_id, "path": f"/{plural(key)}"}
@@ -1166,8 +1201,6 @@ async def like(request):
 
 @app.get("/playlists")
 async def fetch_playlists(request):
-    conn = request["dbpool"]
-
     keys = {"genre", "country", "city", "genres", "countries"}
     args = set(request.args.keys())
     if not keys & args:
@@ -1179,25 +1212,26 @@ async def fetch_playlists(request):
 
     if "genre" in args:
         genre = request.args.get("genre")
-        playlists = await conn.fetch("SELECT * FROM playlists WHERE genre = $1", genre)
+        playlists = CATALOG.get_playlists("genre", [genre])
     elif "genres" in args:
         genres = request.args.get("genres").split(",")
-        playlists = await conn.fetch(SQL.genre_playlists, genres)
+        playlists = CATALOG.get_playlists("genre", genres)
     elif "countries" in args:
         countries = request.args.get("countries").split(",")
-        playlists = await conn.fetch(SQL.country_playlists, countries)
+        playlists = CATALOG.get_playlists("country", countries)
     elif "country" in args:
         country = request.args.get("country")
-        playlists = await conn.fetch(SQL.country_playlists, [country])
+        playlists = CATALOG.get_playlists("country", [country])
     elif "city" in args:
         city = request.args.get("city")
-        playlists = await conn.fetch(SQL.city_playlists, [city])
+        playlists = CATALOG.get_playlists("city", [city])
 
     return with_cache(
         playlists,
         without_user_id=True,
         without_etag=True,
         max_age=seconds_until_next_playlist_fetch(),
+        catalog=True,
     )
 
 
@@ -1290,131 +1324,175 @@ async def recv_json(ws):
     data = ujson.loads(data)
     if not data:
         return None
-    data = transform_keys(data, snakecase)
+    data = transform_keys(data, snakecase_key)
     return data
 
 
 @app.websocket("/playlist-tuner")
 async def playlist_tuner(request, ws):
     spotify = request["spotify"]
+    async with client_in_use(spotify):
 
-    async def send_recommendations(data):
-        try:
-            artists = data.get("seed_artists", [])
-            genres = data.get("seed_genres", [])
-            tracks = data.get("seed_tracks", [])
-            limit = data.get("limit", 50)
-
-            with_tuneable_attributes = data.get("with_tuneable_attributes", False)
-            tuneable_attributes = data.get("tuneable_attributes", None)
-            tuneable_attributes = get_tuneable_attributes(tuneable_attributes)
-
-            tracks = await spotify.recommendations(
-                seed_artists=artists,
-                seed_genres=genres,
-                seed_tracks=tracks,
-                limit=limit,
-                **tuneable_attributes,
-            )
-
-            if with_tuneable_attributes:
-                tracks["tracks"] = await assign_audio_features(
-                    spotify, tracks["tracks"]
-                )
-
-            data = [t.to_dict() for t in tracks]
-            data = transform_keys(data, camelcase)
-            await ws.send(ujson.dumps(data))
-
-        except asyncio.CancelledError:
-            pass
-        except Exception as exc:
-            await app.error_handler.default(request, exc)
-            logger.exception(exc)
-
-    sender_task = None
-    while True:
-        data = await recv_json(ws)
-        if not data:
-            continue
+        async def send_recommendations(data):
+            try:
+                attributes = quantize_attributes(data.get("tuneable_attributes"))
+                key = recommendation_key(spotify.user_id, data, attributes)
+                message = RECOMMENDATION_CACHE.get(key)
+                if message is None:
+                    await asyncio.sleep(TUNER_DEBOUNCE)
+                    tracks = await spotify.recommendations(
+                        seed_artists=data.get("seed_artists", []),
+                        seed_genres=data.get("seed_genres", []),
+                        seed_tracks=data.get("seed_tracks", []),
+                        limit=data.get("limit", 50),
+                        **get_tuneable_attributes(attributes),
+                    )
+
+                    if data.get("with_tuneable_attributes", False):
+                        tracks["tracks"] = await assign_audio_features(
+                            spotify, tracks["tracks"], conn=request["dbpool"]
+                        )
+
+                    data = [t.to_dict() for t in tracks]
+                    message = ujson.dumps(transform_keys(data, camelcase_key))
+                    RECOMMENDATION_CACHE.set(key, message)
+
+                await ws.send(message)
+
+            except asyncio.CancelledError:
+                pass
+            except Exception as exc:
+                await app.error_handler.default(request, exc)
+                logger.exception(exc)
+
+        sender_task = None
+        while True:
+            data = await recv_json(ws)
+            if not data:
+                continue
 
-        if sender_task and not sender_task.done() and not sender_task.cancelled():
-            sender_task.cancel()
+            if sender_task and not sender_task.done() and not sender_task.cancelled():
+                sender_task.cancel()
 
-        sender_task = asyncio.create_task(send_recommendations(data))
+            sender_task = asyncio.create_task(send_recommendations(data))
 
 
 @app.websocket("/playback-controller")
 async def playback_controller(request, ws):
     spotify = request["spotify"]
+    async with client_in_use(spotify):
+        sender = StateSender(ws, diff=request.args.get("diff") == "true")
 
-    async def send_playback():
-        await asyncio.sleep(0.5)
-        data = await get_devices_and_playback(spotify)
-        data = transform_keys(data, camelcase)
-        await ws.send(ujson.dumps(data))
+        async def send_playback():
+            await asyncio.sleep(0.5)
+            data = await get_devices_and_playback(spotify)
+            await sender.send(transform_keys(data, camelcase_key))
 
-    async def handle_action(action):
-        try:
-            if action == "PLAY":
-                await start_playback(
-                    spotify, data, request["player"], request["volume_fader"]
-                )
-            elif action == "PAUSE":
-                await spotify.pause_playback(retries=0)
-            elif action == "NEXT_TRACK":
-                await spotify.next_track(retries=0)
-            elif action == "PREVIOUS_TRACK":
-                await spotify.previous_track(retries=0)
-        except SpotifyDeviceUnavailableException:
-            pass
-        else:
-            asyncio.create_task(send_playback())
+        async def handle_action(action):
+            try:
+                if action == "PLAY":
+                    await start_playback(
+                        spotify, data, request["player"], request["volume_fader"]
+                    )
+                elif action == "PAUSE":
+                    await spotify.pause_playback(retries=0)
+                elif action == "NEXT_TRACK":
+                    await spotify.next_track(retries=0)
+                elif action == "PREVIOUS_TRACK":
+                    await spotify.previous_track(retries=0)
+            except SpotifyDeviceUnavailableException:
+                pass
+            else:
+                asyncio.create_task(send_playback())
 
-    while True:
-        data = await recv_json(ws)
-        if not data:
-            continue
+        while True:
+            data = await recv_json(ws)
+            if not data:
+                continue
 
-        action = data.pop("action", None)
-        if not action:
-            continue
+            action = data.pop("action", None)
+            if not action:
+                continue
 
-        asyncio.create_task(handle_action(action))
+            asyncio.create_task(handle_action(action))
 
 
 @app.websocket("/devices-watcher/<polling:int>")
 async def devices_watcher(request, ws, polling=30):
     spotify = request["spotify"]
-    polling = [polling]
+    async with client_in_use(spotify):
+        sender = StateSender(ws, diff=request.args.get("diff") == "true")
+        poller = DevicePoller.for_user(spotify)
+        queue = poller.subscribe(spotify, polling)
 
-    async def polling_updater():
-        while True:
-            try:
-                data = await ws.recv()
-            except:
-                break
+        async def polling_updater():
+            while True:
+                try:
+                    data = await ws.recv()
+                except:
+                    break
+
+                if data:
+                    try:
+                        poller.update(queue, max(int(data), 2))
+                    except:
+                        pass
 
-            if data:
+        async def state_sender():
+            while True:
+                state = await queue.get()
+                if state is None:
+                    break
+
+                data, message = state
                 try:
-                    new_polling = int(data)
-                    if new_polling != polling[0]:
-                        polling[0] = max(new_polling, 2)
+                    await sender.send(data, message)
                 except:
-                    pass
+                    break
+
+        tasks = [
+            asyncio.create_task(polling_updater()),
+            asyncio.create_task(state_sender()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            poller.unsubscribe(queue)
+
+
+@app.listener("before_server_start")
+async def load_catalog(_app, loop):
+    await CATALOG.start(DBPOOL, await create_pool_lenient(REDIS_SETTINGS, loop))
+
+
+@app.listener("before_server_start")
+async def start_cache_logging(_app, loop):
+    loop.create_task(
+        log_cache_info(
+            {
+                "clients": client.cache_info,
+                "tokens": TOKEN_USERS.info,
+                "artists": ARTIST_CACHE.info,
+                "dislikes": DISLIKES_CACHE.info,
+                "recommendations": RECOMMENDATION_CACHE.info,
+                "genre_seeds": genre_seeds.cache_info,
+                "http_connections": CONNECTION_STATS.to_dict,
+            },
+            config.cache.stats.interval or 600,
+        )
+    )
+
 
-    asyncio.create_task(polling_updater())
+@app.listener("after_server_stop")
+async def close_http_connector(_app, _loop):
+    await close_shared_connector()
 
-    while True:
-        data = await get_devices_and_playback(spotify)
-        data = transform_keys(data, camelcase)
-        await ws.send(ujson.dumps(data))
 
-        old_polling = polling[0]
-        for _ in range(0, old_polling, 2):
-            await asyncio.sleep(2)
-            if polling[0] != old_polling:
-                break
+@app.listener("after_server_stop")
+async def stop_catalog(_app, _loop):
+    await CATALOG.stop()
 
 
 if config.api.cors:
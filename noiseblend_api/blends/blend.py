@@ -1,10 +1,12 @@
+import asyncio
 import random
 from collections import defaultdict
+from itertools import chain
 
 from spfy.constants import TimeRange
 
 from .. import logger
-from ..helpers import user_disliked_artists, user_disliked_genres
+from ..helpers import get_artists, get_audio_features, get_dislikes
 
 
 class Blend:
@@ -44,7 +46,9 @@ class Blend:
             limit=50,
         )
 
-        audio_features = await self.spotify.audio_features(tracks=top_tracks)
+        audio_features = await get_audio_features(
+            self.spotify, [t.id for t in top_tracks], conn=self.dbpool
+        )
         if selection_attributes:
             matching_top_tracks = [
                 audio_feature.id
@@ -99,6 +103,41 @@ class Blend:
 
         return tracks
 
+    async def recommend_by_artists(self, track_limit, attributes, artists):
+        if not artists:
+            return []
+
+        tracks = (
+            await self.spotify.recommendations(
+                seed_artists=artists, limit=track_limit, **attributes
+            )
+        ).tracks
+        logger.debug("Recommendations: %d tracks", len(tracks))
+        return tracks
+
+    async def recommend_by_seed_artists(
+        self,
+        track_limit,
+        attributes,
+        artists=None,
+        artist_limit=None,
+        time_range=None,
+        related=True,
+    ):
+        artists = artists or await self.get_top_artists(
+            artist_limit or self.ARTIST_LIMIT, time_range=time_range, related=related
+        )
+        artists = random.sample(artists, min(len(artists), 5))
+
+        requests = [self.recommend_by_artists(track_limit, attributes, artists)]
+        if self.GENRES:
+            requests.append(
+                self.recommend_by_genres(track_limit, attributes, artists=artists)
+            )
+
+        tracks, *genre_tracks = await asyncio.gather(*requests)
+        return tracks, (genre_tracks[0] if genre_tracks else [])
+
     @staticmethod
     def get_genre_artist_mapping(artists, min_artists=1):
         genre_artists = defaultdict(list)
@@ -130,7 +169,11 @@ class Blend:
                     return random.choice(choices)
         return random.sample(artists, min(min_artists, len(artists)))
 
-    async def filter_tracks(self, tracks, filter_explicit):
+    async def get_dislikes(self):
+        dislikes = await get_dislikes(self.spotify, conn=self.dbpool)
+        return dislikes.artists, dislikes.genres
+
+    async def filter_tracks(self, tracks, filter_explicit, dislikes=None):
         tracks = [
             t
             for t in tracks
@@ -138,17 +181,15 @@ class Blend:
         ]
         logger.debug("Playable: %d tracks", len(tracks))
 
-        disliked_artists = set(
-            await user_disliked_artists(self.spotify, conn=self.dbpool)
-        )
-        disliked_genres = set(
-            await user_disliked_genres(self.spotify, conn=self.dbpool)
-        )
-        tracks = [
-            t
-            for t in tracks
-            if not await self.disliked_track(t, disliked_artists, disliked_genres)
-        ]
+        disliked_artists, disliked_genres = dislikes or await self.get_dislikes()
+        tracks = [t for t in tracks if not {a.id for a in t.artists} & disliked_artists]
+        if disliked_genres:
+            artist_genres = await self.artist_genres(tracks)
+            tracks = [
+                t
+                for t in tracks
+                if not self.track_genres(t, artist_genres) & disliked_genres
+            ]
         logger.debug("Dislike Filter: %d tracks", len(tracks))
 
         if filter_explicit:
@@ -157,14 +198,18 @@ class Blend:
 
         return [t.id for t in tracks]
 
-    async def track_genres(self, track):
-        artists = await self.spotify.artists(a.id for a in track.artists)
-        return set(sum([(a.genres or []) for a in artists], []))
+    async def artist_genres(self, tracks):
+        artist_ids = list({a.id for t in tracks for a in t.artists})
+        if not artist_ids:
+            return {}
+
+        artists = await get_artists(self.spotify, artist_ids)
+        return {a.id: a.genres or [] for a in artists}
 
-    async def disliked_track(self, track, disliked_artists, disliked_genres):
-        return bool(
-            set(a.id for a in track.artists) & disliked_artists
-            or (await self.track_genres(track)) & disliked_genres
+    @staticmethod
+    def track_genres(track, artist_genres):
+        return set(
+            chain.from_iterable(artist_genres.get(a.id, []) for a in track.artists)
         )
 
     # pylint: disable=too-many-locals
@@ -181,61 +226,63 @@ class Blend:
         time_range=None,
     ):
         track_limit = track_limit or self.TRACK_LIMIT
-        artists = artists or await self.get_top_artists(
-            artist_limit or self.ARTIST_LIMIT,
-            time_range=time_range,
-            related=top_artists_related,
-        )
-        artists = random.sample(artists, min(len(artists), 5))
-
         if attributes:
             attributes = {k: str(v) for k, v in attributes.items()}
         else:
             attributes = self.attributes
 
-        tracks = []
-        if artists:
-            tracks = (
-                await self.spotify.recommendations(
-                    seed_artists=artists, limit=track_limit, **attributes
-                )
-            ).tracks
-            logger.debug("Recommendations: %d tracks", len(tracks))
+        requests = {
+            "dislikes": self.get_dislikes(),
+            "seed_artists": self.recommend_by_seed_artists(
+                track_limit,
+                attributes,
+                artists=artists,
+                artist_limit=artist_limit,
+                time_range=time_range,
+                related=top_artists_related,
+            ),
+        }
 
         top_tracks_count = top_tracks_count or self.TOP_TRACKS_COUNT
-        top_tracks = []
         if top_tracks_count:
-            top_tracks = await self.get_top_related_tracks(top_tracks_count)
-            logger.debug("Top Tracks: %d tracks", len(top_tracks))
+            requests["top_tracks"] = self.get_top_related_tracks(top_tracks_count)
 
-        if self.GENRES:
-            genre_tracks = await self.recommend_by_genres(
-                track_limit, attributes, artists=artists
+        if self.TOP_TRACKS_ATTRIBUTES:
+            requests["top_tracks_recommendations"] = self.recommend_by_top_tracks(
+                track_limit, attributes
             )
+
+        responses = await asyncio.gather(*requests.values())
+        responses = dict(zip(requests.keys(), responses))
+
+        tracks, genre_tracks = responses["seed_artists"]
+        top_tracks = responses.get("top_tracks", [])
+        logger.debug("Top Tracks: %d tracks", len(top_tracks))
+
+        if self.GENRES:
             tracks_count = int(len(tracks) * (1 - self.GENRE_TO_ARTIST_RATIO))
             tracks = random.sample(tracks, tracks_count) + genre_tracks
 
             logger.debug("Genres: %d tracks", len(genre_tracks))
             logger.debug("Random Sample (genres): %d tracks", len(tracks))
 
-        if self.TOP_TRACKS_ATTRIBUTES:
-            recommended_by_top_tracks = await self.recommend_by_top_tracks(
-                track_limit, attributes
-            )
-            if recommended_by_top_tracks:
-                tracks_count = int(len(tracks) * (1 - self.TOP_TRACKS_TO_ARTIST_RATIO))
-                tracks = random.sample(tracks, tracks_count) + recommended_by_top_tracks
+        recommended_by_top_tracks = responses.get("top_tracks_recommendations")
+        if recommended_by_top_tracks:
+            tracks_count = int(len(tracks) * (1 - self.TOP_TRACKS_TO_ARTIST_RATIO))
+            tracks = random.sample(tracks, tracks_count) + recommended_by_top_tracks
 
-                logger.debug(
-                    "Recommended by Top Tracks: %d tracks",
-                    len(recommended_by_top_tracks),
-                )
-                logger.debug("Random Sample (recomm): %d tracks", len(tracks))
+            logger.debug(
+                "Recommended by Top Tracks: %d tracks",
+                len(recommended_by_top_tracks),
+            )
+            logger.debug("Random Sample (recomm): %d tracks", len(tracks))
 
         tracks = random.sample(tracks, min(len(tracks), track_limit)) + top_tracks
         logger.debug("Random Sample: %d tracks", len(tracks))
 
-        tracks = await self.filter_tracks(tracks, filter_explicit)
+        tracks = await self.filter_tracks(
+            tracks, filter_explicit, dislikes=responses["dislikes"]
+        )
         logger.debug("Filter: %d tracks", len(tracks))
         if not tracks:
             return None
@@ -4,6 +4,7 @@ import random
 from spfy import TimeRange
 
 from .. import logger
+from ..genres import genre_seeds
 from .blend import Blend
 
 
@@ -47,14 +48,14 @@ class Random(Blend):
         else:
             attributes = self.attributes
 
-        requests = {}
+        requests = {"dislikes": self.get_dislikes()}
         if seed_artists_count:
             requests["seed_artists"] = self.get_top_artists(
                 seed_artists_count, time_range=time_range, related=False
             )
 
         if seed_genres_count:
-            requests["seed_genres"] = self.spotify.recommendation_genre_seeds()
+            requests["seed_genres"] = genre_seeds(self.spotify)
 
         if seed_tracks_count:
             requests["seed_tracks"] = self.spotify.current_user_top_tracks(
@@ -64,6 +65,7 @@ class Random(Blend):
         top_tracks = []
         responses = await asyncio.gather(*requests.values())
         params = dict(zip(requests.keys(), responses))
+        dislikes = params.pop("dislikes")
         if "seed_genres" in params:
             genres = params["seed_genres"].genres
             params["seed_genres"] = random.sample(
@@ -80,7 +82,7 @@ class Random(Blend):
         tracks = (
             await self.spotify.recommendations(limit=100, **params, **attributes)
         ).tracks
-        tracks = await self.filter_tracks(tracks, filter_explicit)
+        tracks = await self.filter_tracks(tracks, filter_explicit, dislikes=dislikes)
         tracks = (
             random.sample(tracks, min(100 - len(top_tracks), len(tracks))) + top_tracks
         )
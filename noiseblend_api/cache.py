@@ -1,32 +1,159 @@
+import asyncio
 import functools
+import time
 from collections import OrderedDict
 from inspect import isawaitable
 
+from . import logger
 
-def async_lru(size=100, evict_callback=None, cache=None):
+
+def run_callback(callback, *args):
+    result = callback(*args)
+    if isawaitable(result):
+        asyncio.ensure_future(result)
+
+
+def default_key(*args, **kwargs):
+    if kwargs:
+        return (args, tuple(sorted(kwargs.items())))
+    return args
+
+
+class LRUCache:
+    def __init__(self, size=100, ttl=None, on_evict=None, sliding=False):
+        self.size = size
+        self.ttl = ttl
+        self.sliding = sliding
+        self.on_evict = on_evict
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def evict(self, value):
+        self.evictions += 1
+        if self.on_evict:
+            run_callback(self.on_evict, value)
+
+    def get(self, key, default=None):
+        try:
+            value, expires_at = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.misses += 1
+            self.evict(value)
+            return default
+
+        self.hits += 1
+        if self.sliding and self.ttl:
+            expires_at = time.monotonic() + self.ttl
+        self.data[key] = (value, expires_at)
+        return value
+
+    def expire(self):
+        now = time.monotonic()
+        while self.data:
+            key, (value, expires_at) = next(iter(self.data.items()))
+            if expires_at is None or expires_at > now:
+                break
+            del self.data[key]
+            self.evict(value)
+
+    def set(self, key, value, ttl=None):
+        self.data.pop(key, None)
+        self.expire()
+        while self.data and len(self.data) >= self.size:
+            _, (evicted, _) = self.data.popitem(last=False)
+            self.evict(evicted)
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self.data[key] = (value, expires_at)
+
+    def pop(self, key, default=None):
+        try:
+            return self.data.pop(key)[0]
+        except KeyError:
+            return default
+
+    def clear(self):
+        self.data.clear()
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.data),
+            "max_size": self.size,
+        }
+
+
+MISSING = object()
+
+
+def async_lru(
+    size=100,
+    ttl=None,
+    key=default_key,
+    evict_callback=None,
+    cache=None,
+    single_flight=False,
+):
     if cache is None:
-        cache = OrderedDict()
+        cache = LRUCache(size=size, ttl=None if callable(ttl) else ttl)
+    if evict_callback:
+        cache.on_evict = evict_callback
+    inflight = {}
 
     def decorator(fn):
+        async def call(cache_key, args, kwargs):
+            result = await fn(*args, **kwargs)
+            if args or kwargs:
+                if not isinstance(result, dict) or not result.get("__NOCACHE__"):
+                    entry_ttl = ttl(result) if callable(ttl) else None
+                    cache.set(cache_key, result, ttl=entry_ttl)
+            return result
+
         @functools.wraps(fn)
         async def memoizer(*args, **kwargs):
-            key = str((args, kwargs))
-            try:
-                result = cache.pop(key)
-                cache[key] = result
-            except KeyError:
-                if len(cache) >= size:
-                    _, evicted = cache.popitem(last=False)
-                    if evict_callback:
-                        result = evict_callback(evicted)
-                        if isawaitable(result):
-                            await result
-                result = await fn(*args, **kwargs)
-                if args or kwargs:
-                    if not isinstance(result, dict) or not result.get("__NOCACHE__"):
-                        cache[key] = result
-            return result
+            cache_key = key(*args, **kwargs)
+            result = cache.get(cache_key, MISSING)
+            if result is not MISSING:
+                return result
+
+            if not single_flight:
+                return await call(cache_key, args, kwargs)
+
+            if cache_key not in inflight:
+                inflight[cache_key] = asyncio.ensure_future(
+                    call(cache_key, args, kwargs)
+                )
+                inflight[cache_key].add_done_callback(
+                    lambda _: inflight.pop(cache_key, None)
+                )
+            return await asyncio.shield(inflight[cache_key])
 
+        def invalidate(*args, **kwargs):
+            return cache.pop(key(*args, **kwargs), None)
+
+        memoizer.cache = cache
+        memoizer.cache_info = cache.info
+        memoizer.cache_key = key
+        memoizer.invalidate = invalidate
         return memoizer
 
     return decorator
+
+
+async def log_cache_info(caches, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for name, cache_info in caches.items():
+            logger.info("Stats for %s: %s", name, cache_info())
@@ -0,0 +1,162 @@
+import asyncio
+import random
+from collections import defaultdict
+from datetime import datetime
+from itertools import chain
+
+from . import logger
+from .cache import LRUCache
+from .sql import SQL
+
+CATALOG_CHANNEL = "noiseblend:catalog-reload"
+CATALOG_VERSION_KEY = "noiseblend:catalog-version"
+KINDS = ("genre", "country", "city")
+IMAGE_FIELDS = ("url", "color", "unsplash_user_fullname", "unsplash_user_username")
+EMPTY_IMAGE = dict.fromkeys(IMAGE_FIELDS)
+
+
+def image_matches(image, width=None, height=None):
+    return (width is not None and (image["width"] or 0) >= width) or (
+        height is not None and (image["height"] or 0) >= height
+    )
+
+
+class Catalog:
+    def __init__(self):
+        self.playlists = {kind: {} for kind in KINDS}
+        self.images = {kind: {} for kind in KINDS}
+        self.cities = {}
+        self.countries = []
+        self.best_images = LRUCache(size=10000)
+        self.loaded_at = None
+        self.version = None
+        self.redis = None
+        self.watcher = None
+
+    async def load(self, conn):
+        playlist_rows, image_rows, country_rows = await asyncio.gather(
+            conn.fetch(SQL.catalog_playlists),
+            conn.fetch(SQL.catalog_images),
+            conn.fetch(SQL.catalog_countries),
+        )
+
+        playlists = {kind: defaultdict(list) for kind in KINDS}
+        cities = defaultdict(set)
+        for row in playlist_rows:
+            playlist = dict(row)
+            if playlist["genre"]:
+                playlists["genre"][playlist["genre"]].append(playlist)
+            if playlist["city"]:
+                playlists["city"][playlist["city"]].append(playlist)
+                cities[playlist["country"]].add(playlist["city"])
+            elif playlist["country"] and not playlist["date"]:
+                playlists["country"][playlist["country"]].append(playlist)
+
+        images = {kind: defaultdict(list) for kind in KINDS}
+        for row in image_rows:
+            for kind in KINDS:
+                if row[kind]:
+                    images[kind][row[kind]].append(dict(row))
+
+        self.playlists = {kind: dict(items) for kind, items in playlists.items()}
+        self.images = {kind: dict(items) for kind, items in images.items()}
+        self.cities = dict(cities)
+        self.countries = [dict(c) for c in country_rows]
+        self.best_images = LRUCache(size=10000)
+        self.loaded_at = datetime.utcnow()
+        logger.info(
+            "Loaded catalog with %d playlists and %d images",
+            len(playlist_rows),
+            len(image_rows),
+        )
+
+    async def start(self, conn, redis):
+        self.redis = redis
+        self.version = await redis.get(CATALOG_VERSION_KEY, encoding="utf-8")
+        await self.load(conn)
+        self.watcher = asyncio.ensure_future(self.watch(conn, redis))
+
+    async def stop(self):
+        if self.watcher:
+            self.watcher.cancel()
+            self.watcher = None
+        if self.redis:
+            self.redis.close()
+            await self.redis.wait_closed()
+            self.redis = None
+
+    async def watch(self, conn, redis):
+        (channel,) = await redis.subscribe(CATALOG_CHANNEL)
+        while await channel.wait_message():
+            version = await channel.get(encoding="utf-8")
+            try:
+                await self.load(conn)
+                self.version = version
+            except Exception as exc:
+                logger.error("Error reloading catalog:")
+                logger.exception(exc)
+
+    def add_images(self, kind, images):
+        for image in images:
+            item = image.get(kind)
+            if not item:
+                continue
+            item_images = self.images[kind].setdefault(item, [])
+            item_images.append(image)
+            item_images.sort(key=lambda i: i["width"] or 0)
+        if images:
+            self.best_images.clear()
+
+    def country_cities(self, country):
+        return self.cities.get(country, set())
+
+    def items(self, kind):
+        return set(self.playlists[kind])
+
+    def get_playlists(self, kind, items, country=None):
+        playlists = chain.from_iterable(
+            self.playlists[kind].get(item, []) for item in items
+        )
+        if country:
+            return [p for p in playlists if p["country"] == country]
+        return list(playlists)
+
+    def best_image(self, kind, item, width=None, height=None):
+        key = (kind, item, width, height)
+        best_image = self.best_images.get(key)
+        if best_image is None:
+            image = next(
+                (
+                    i
+                    for i in self.images[kind].get(item, [])
+                    if image_matches(i, width, height)
+                ),
+                None,
+            )
+            best_image = (
+                {field: image[field] for field in IMAGE_FIELDS}
+                if image
+                else EMPTY_IMAGE
+            )
+            self.best_images.set(key, best_image)
+        return best_image
+
+    # pylint: disable=too-many-arguments
+    def item_playlists(
+        self, kind, items, limit=None, width=None, height=None, country=None
+    ):
+        items = [
+            item for item in set(items) if self.get_playlists(kind, [item], country)
+        ]
+        if limit:
+            items = random.sample(items, min(limit, len(items)))
+
+        playlists = [
+            {**playlist, "image": self.best_image(kind, item, width, height)}
+            for item in items
+            for playlist in self.get_playlists(kind, [item], country)
+        ]
+        return sorted(playlists, key=lambda p: p["id"])
+
+
+CATALOG = Catalog()
@@ -0,0 +1,11 @@
+from sanic.response import StreamingHTTPResponse
+from sanic_compress import Compress
+
+
+class AppCompress(Compress):
+    async def _compress_response(self, request, response):
+        if isinstance(response, StreamingHTTPResponse):
+            return response
+
+        request["uncompressed_body"] = response.body
+        return await super()._compress_response(request, response)
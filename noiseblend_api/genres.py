@@ -0,0 +1,57 @@
+from collections import Counter, defaultdict
+
+from fuzzywuzzy import fuzz
+
+from . import config
+from .cache import LRUCache, async_lru
+
+CANDIDATES = 10
+
+
+def trigrams(text):
+    text = f"  {text.lower()} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class GenreIndex:
+    def __init__(self, genres):
+        self.genres = list(genres)
+        self.genre_set = set(self.genres)
+        self.index = defaultdict(set)
+        for genre in self.genres:
+            for trigram in trigrams(genre):
+                self.index[trigram].add(genre)
+        self.matches = LRUCache(size=1000)
+
+    def candidates(self, name):
+        counts = Counter()
+        for trigram in trigrams(name):
+            counts.update(self.index.get(trigram, ()))
+        return [genre for genre, _ in counts.most_common(CANDIDATES)] or self.genres
+
+    def match(self, name):
+        if name in self.genre_set:
+            return name
+
+        genre = self.matches.get(name)
+        if genre is None:
+            genre = max(
+                self.candidates(name), key=lambda genre: fuzz.ratio(name, genre)
+            )
+            self.matches.set(name, genre)
+        return genre
+
+
+def genre_seeds_key(*_args, **_kwargs):
+    return "genre_seeds"
+
+
+@async_lru(
+    size=1,
+    ttl=config.cache.genre_seeds.ttl or 86400,
+    key=genre_seeds_key,
+    single_flight=True,
+)
+async def genre_seeds(spotify):
+    response = await spotify.recommendation_genre_seeds()
+    return GenreIndex(response.genres)
@@ -5,7 +5,6 @@ from base64 import b64encode
 from datetime import datetime, timedelta
 from dateutil import relativedelta as rld
 from first import first
-from fuzzywuzzy import fuzz
 from hashlib import sha1
 from itertools import chain
 from spfy.cache import Image, ImageMixin, Playlist
@@ -14,20 +13,44 @@ from spfy.exceptions import SpotifyDeviceUnavailableException
 from spfy.util import normalize_features
 from uuid import UUID
 
+from . import config, json
+from .cache import LRUCache
 from .constants import ALL_FIELDS, BLEND_ALLOWED_FIELDS, PLAYLIST_DESCRIPTIONS
 from .sql import SQL
 
 NEXT_FRIDAY_DELTA = rld.relativedelta(
     weekday=rld.FR, hour=13, minute=0, second=0, microsecond=0
 )
-
-
-def fuzzysearch(needle, haystack):
-    if not isinstance(haystack, set):
-        haystack = set(haystack)
-    if needle in haystack:
-        return needle
-    return max(haystack, key=lambda hay: fuzz.ratio(needle, hay))
+ARTIST_CACHE = LRUCache(
+    size=config.cache.artists.size or 10000, ttl=config.cache.artists.ttl or 3600
+)
+ARTIST_REDIS_TTL = config.cache.artists.redis_ttl or 86400
+DISLIKE_KINDS = ("artists", "genres", "countries", "cities")
+DISLIKES_CACHE = LRUCache(
+    size=config.cache.dislikes.size or 10000, ttl=config.cache.dislikes.ttl or 30
+)
+DISLIKES_REDIS_TTL = config.cache.dislikes.redis_ttl or 86400
+DISLIKES_CHANNEL = "noiseblend:dislikes-invalidation"
+RECOMMENDATION_CACHE = LRUCache(
+    size=config.cache.recommendations.size or 1000,
+    ttl=config.cache.recommendations.ttl or 600,
+)
+TUNER_DEBOUNCE = config.cache.recommendations.debounce or 0.3
+AUDIO_FEATURE_COLUMNS = (
+    "acousticness",
+    "danceability",
+    "duration_ms",
+    "energy",
+    "instrumentalness",
+    "key",
+    "liveness",
+    "loudness",
+    "mode",
+    "speechiness",
+    "tempo",
+    "time_signature",
+    "valence",
+)
 
 
 def plural(item):
@@ -146,13 +169,50 @@ def assign_best_image(item, width=None, height=None):
     return item
 
 
-async def assign_audio_features(spotify, tracks=None, playlist=None):
+def audio_feature_row(audio_feature):
+    audio_feature = {**audio_feature, "mode": bool(audio_feature["mode"])}
+    return [audio_feature["id"], *[audio_feature[c] for c in AUDIO_FEATURE_COLUMNS]]
+
+
+async def get_audio_features(spotify, track_ids, conn=None):
+    conn = conn or await spotify.dbpool
+    track_ids = list(dict.fromkeys(t for t in track_ids if t))
+    if not track_ids:
+        return []
+
+    audio_features = {
+        row["id"]: addict.Dict(dict(row, mode=int(row["mode"])))
+        for row in await conn.fetch(SQL.audio_features, track_ids)
+    }
+
+    missing = [t for t in track_ids if t not in audio_features]
+    if missing:
+        batches = await asyncio.gather(
+            *[
+                spotify.audio_features(tracks=missing[i : i + 100])
+                for i in range(0, len(missing), 100)
+            ]
+        )
+        fetched = [a for a in chain.from_iterable(batches) if a]
+        for audio_feature in fetched:
+            audio_features[audio_feature.id] = audio_feature
+
+        if fetched:
+            rows = [audio_feature_row(a) for a in fetched]
+            await conn.execute(
+                SQL.insert_audio_features, *[list(column) for column in zip(*rows)]
+            )
+
+    return [audio_features.get(t) for t in track_ids]
+
+
+async def assign_audio_features(spotify, tracks=None, playlist=None, conn=None):
     if not tracks and playlist:
         tracks = [t["track"] for t in playlist["tracks"]["items"]]
 
     tracks_dict = {t["id"]: t for t in tracks}
 
-    audio_features = await spotify.audio_features(tracks=tracks_dict.keys())
+    audio_features = await get_audio_features(spotify, tracks_dict.keys(), conn=conn)
 
     track_ids = [a.id for a in audio_features if a]
     audio_feature_keys = {f.value for f in AudioFeature}
@@ -231,7 +291,7 @@ async def assign_images(items, key, _type, width, height, conn=None):
         if not (it.get("playlist") or it["playlists"][0])["image"]["url"]
     ]
     if not items_without_image:
-        return
+        return []
 
     fields = await asyncio.gather(
         *[
@@ -239,16 +299,19 @@ async def assign_images(items, key, _type, width, height, conn=None):
             for it in items_without_image
         ]
     )
+    upserted = []
     for image_fields, updated_fields in fields:
         images = await ImageMixin.upsert_unsplash_image(
             conn, image_fields, **updated_fields
         )
         if images:
+            upserted += images
             image = ImageMixin.get_optimal_image(images, width=width, height=height)
             for it in items:
                 if it[key] == image[_type]:
                     it["image"] = dict(image)
                     break
+    return upserted
 
 
 async def add_image(spotify, playlist_id, image, conn=None):
@@ -261,6 +324,45 @@ async def add_image(spotify, playlist_id, image, conn=None):
         await spotify.user_playlist_upload_cover_image(playlist_id, image_content)
 
 
+def artist_key(artist_id):
+    return f"noiseblend:artist:{artist_id}"
+
+
+async def get_artists(spotify, artist_ids):
+    artist_ids = list(dict.fromkeys(artist_ids))
+    artists = {}
+    for artist_id in artist_ids:
+        artist = ARTIST_CACHE.get(artist_id)
+        if artist is not None:
+            artists[artist_id] = artist
+
+    missing = [a for a in artist_ids if a not in artists]
+    if missing and spotify.redis:
+        cached = await spotify.redis.mget(*[artist_key(a) for a in missing])
+        for artist in cached:
+            if artist:
+                artist = addict.Dict(json.loads(artist))
+                artists[artist.id] = artist
+                ARTIST_CACHE.set(artist.id, artist)
+        missing = [a for a in missing if a not in artists]
+
+    if missing:
+        fetched = [
+            addict.Dict(a.to_dict()) for a in await spotify.artists(missing) if a
+        ]
+        for artist in fetched:
+            artists[artist.id] = artist
+            ARTIST_CACHE.set(artist.id, artist)
+
+        if fetched and spotify.redis:
+            tr = spotify.redis.multi_exec()
+            for artist in fetched:
+                tr.setex(artist_key(artist.id), ARTIST_REDIS_TTL, json.dumps(artist))
+            await tr.execute()
+
+    return [artists[a] for a in artist_ids if a in artists]
+
+
 def make_columns_serializable(record):
     for col, val in record.items():
         if isinstance(val, UUID):
@@ -287,12 +389,74 @@ async def get_user_dict(spotify, conn=None):
     return make_columns_serializable(user.to_dict())
 
 
-async def user_disliked_artists(spotify, conn=None):
-    return await conn.fetch(SQL.disliked_artists, spotify.user_id)
+def dislikes_key(user_id):
+    return f"noiseblend:dislikes:{user_id}"
 
 
-async def user_disliked_genres(spotify, conn=None):
-    return await conn.fetch(SQL.disliked_genres, spotify.user_id)
+def make_dislikes(dislikes):
+    return addict.Dict(
+        {kind: frozenset(dislikes.get(kind) or ()) for kind in DISLIKE_KINDS}
+    )
+
+
+async def store_dislikes(redis, user_id, dislikes):
+    await redis.setex(
+        dislikes_key(user_id),
+        DISLIKES_REDIS_TTL,
+        json.dumps({kind: list(items) for kind, items in dislikes.items()}),
+    )
+
+
+def distinct_redis(pools, key=lambda redis: (redis.address, redis.db)):
+    seen = {}
+    for redis in pools:
+        if redis:
+            seen.setdefault(key(redis), redis)
+    return list(seen.values())
+
+
+async def load_dislikes(spotify, conn=None, worker_redis=None, publish=False):
+    dislikes = {kind: [] for kind in DISLIKE_KINDS}
+    for kind, item in await conn.fetch(SQL.user_dislikes, spotify.user_id):
+        dislikes[kind].append(item)
+
+    dislikes = make_dislikes(dislikes)
+    DISLIKES_CACHE.set(spotify.user_id, dislikes)
+    pools = distinct_redis((spotify.redis, worker_redis))
+    await asyncio.gather(
+        *[store_dislikes(redis, spotify.user_id, dislikes) for redis in pools]
+    )
+    if publish:
+        for redis in distinct_redis(pools, key=lambda redis: redis.address):
+            await redis.publish(DISLIKES_CHANNEL, spotify.user_id)
+    return dislikes
+
+
+async def refresh_dislikes(spotify, conn=None, worker_redis=None):
+    return await load_dislikes(
+        spotify, conn=conn, worker_redis=worker_redis, publish=True
+    )
+
+
+async def listen_for_dislike_invalidations(redis):
+    (channel,) = await redis.subscribe(DISLIKES_CHANNEL)
+    while await channel.wait_message():
+        DISLIKES_CACHE.pop(await channel.get(encoding="utf-8"), None)
+
+
+async def get_dislikes(spotify, conn=None):
+    dislikes = DISLIKES_CACHE.get(spotify.user_id)
+    if dislikes is not None:
+        return dislikes
+
+    if spotify.redis:
+        cached = await spotify.redis.get(dislikes_key(spotify.user_id))
+        if cached:
+            dislikes = make_dislikes(json.loads(cached))
+            DISLIKES_CACHE.set(spotify.user_id, dislikes)
+            return dislikes
+
+    return await load_dislikes(spotify, conn=conn)
 
 
 # pylint: disable=too-many-locals
@@ -364,6 +528,32 @@ async def start_playback(spotify, args, player, volume_fader):
             )
 
 
+def quantize(value):
+    if isinstance(value, list):
+        return [quantize(v) for v in value]
+    if isinstance(value, float):
+        return round(value, 2) if -1 <= value <= 1 else round(value)
+    return value
+
+
+def quantize_attributes(attrs):
+    if not attrs:
+        return {}
+    return {attribute: quantize(value) for attribute, value in attrs.items()}
+
+
+def recommendation_key(user_id, data, attributes):
+    return (
+        user_id,
+        tuple(sorted(data.get("seed_artists", []))),
+        tuple(sorted(data.get("seed_genres", []))),
+        tuple(sorted(data.get("seed_tracks", []))),
+        data.get("limit", 50),
+        bool(data.get("with_tuneable_attributes", False)),
+        tuple(sorted((k, str(v)) for k, v in attributes.items() if v is not None)),
+    )
+
+
 def get_tuneable_attributes(attrs):
     params = {}
     if attrs:
@@ -1,14 +1,92 @@
+from contextlib import asynccontextmanager
+
 import addict
+import aiohttp
 from spfy.asynch import Spotify
+from spfy.mixins.asynch import auth as spfy_auth
 
+from . import config
 from .db import AppUser
 from .sql import SQL
 
+HTTP = config.http
+CONNECTION_STATS = addict.Dict(created=0, reused=0)
+CONNECTOR = None
+
+
+async def on_connection_create_end(_session, _context, _params):
+    CONNECTION_STATS.created += 1
+
+
+async def on_connection_reuseconn(_session, _context, _params):
+    CONNECTION_STATS.reused += 1
+
+
+TRACE_CONFIG = aiohttp.TraceConfig()
+TRACE_CONFIG.on_connection_create_end.append(on_connection_create_end)
+TRACE_CONFIG.on_connection_reuseconn.append(on_connection_reuseconn)
+
+
+def shared_connector():
+    global CONNECTOR  # pylint: disable=global-statement
+    if CONNECTOR is None or CONNECTOR.closed:
+        CONNECTOR = aiohttp.TCPConnector(
+            limit=HTTP.limit or 100,
+            limit_per_host=HTTP.limit_per_host or 50,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP.dns_ttl or 300,
+            keepalive_timeout=HTTP.keepalive_timeout or 60,
+            enable_cleanup_closed=True,
+        )
+    return CONNECTOR
+
+
+async def close_shared_connector():
+    global CONNECTOR  # pylint: disable=global-statement
+    if CONNECTOR is not None:
+        await CONNECTOR.close()
+        CONNECTOR = None
+
+
+class SharedOAuth2Session(spfy_auth.OAuth2Session):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("connector", shared_connector())
+        kwargs.setdefault("connector_owner", False)
+        kwargs.setdefault("trace_configs", [TRACE_CONFIG])
+        super().__init__(*args, **kwargs)
+
+
+spfy_auth.OAuth2Session = SharedOAuth2Session
+
+
+async def close_session(spotify):
+    if spotify.session:
+        await spotify.session.close()
+
+
+async def close_unused_session(spotify):
+    spotify.evicted = True
+    if not spotify.references:
+        await close_session(spotify)
+
+
+@asynccontextmanager
+async def client_in_use(spotify):
+    spotify.references += 1
+    try:
+        yield spotify
+    finally:
+        spotify.references -= 1
+        if spotify.evicted and not spotify.references:
+            await close_session(spotify)
+
 
 # pylint: disable=too-few-public-methods,too-many-ancestors
 class AppSpotify(Spotify):
     def __init__(self, *args, blend=None, **kwargs):
         self.blend = blend
+        self.references = 0
+        self.evicted = False
         super().__init__(*args, **kwargs)
 
     @property
@@ -1,18 +1,29 @@
-from collections import defaultdict
+import asyncio
+import time
+from base64 import b64decode, b64encode
 from hashlib import sha1
-from uuid import uuid4
 
 import addict
-from sanic.response import text
+from sanic.response import HTTPResponse, text
 from spf import SanicPlugin
 
-from .. import logger
+from .. import config, json, logger
+from ..cache import LRUCache
+from ..catalog import CATALOG
 from ..helpers import get_request_id
 from .priority import PRIORITY
+from .spotify_client import cached_user_id
 
+RESPONSES = config.cache.responses
+INVALIDATION_CHANNEL = "noiseblend:response-invalidation"
 
-def generate_etag():
-    return sha1(uuid4().bytes).hexdigest()
+
+def generate_etag(body):
+    return sha1(body).hexdigest()
+
+
+def response_key(request_id):
+    return f"noiseblend:response:{request_id}"
 
 
 class CacheControl(SanicPlugin):
@@ -20,24 +31,164 @@ class CacheControl(SanicPlugin):
         super().__init__(*args, **kwargs)
 
     def on_registered(self, context, reg, *args, **kwargs):
-        context.responses = defaultdict(dict)
+        context.responses = LRUCache(size=RESPONSES.size or 10000)
+        context.invalidation_listener = None
 
 
 cache_control = CacheControl()
 
 
+def store_local(responses, request_id, query_string, cached, ttl=None):
+    variants = responses.get(request_id)
+    if variants is None:
+        variants = LRUCache(size=RESPONSES.variants or 20)
+        responses.set(request_id, variants)
+    variants.set(query_string, cached, ttl=ttl)
+
+
+async def store_shared(redis, request_id, query_string, cached, ttl=None):
+    key = response_key(request_id)
+    value = json.dumps({**cached, "body": b64encode(cached.body).decode()})
+    tr = redis.multi_exec()
+    tr.hset(key, query_string, value)
+    tr.expire(key, int(ttl or RESPONSES.redis_ttl or 86400))
+    await tr.execute()
+
+
+async def fetch_shared(redis, request_id, query_string):
+    value = await redis.hget(response_key(request_id), query_string)
+    if not value:
+        return None
+
+    cached = addict.Dict(json.loads(value))
+    cached.body = b64decode(cached.body)
+    return cached
+
+
+async def invalidate(context, request_id):
+    context.responses.pop(request_id, None)
+    redis = context.shared.redis
+    if redis:
+        await redis.delete(response_key(request_id))
+        await redis.publish(INVALIDATION_CHANNEL, request_id)
+
+
+async def listen_for_invalidations(context):
+    (channel,) = await context.shared.redis.subscribe(INVALIDATION_CHANNEL)
+    while await channel.wait_message():
+        request_id = await channel.get(encoding="utf-8")
+        context.responses.pop(request_id, None)
+
+
+def is_blend_request(request):
+    spotify = request.get("spotify")
+    return bool(spotify and spotify.blend)
+
+
+def candidate_request_ids(request, user_id=None):
+    if user_id:
+        yield get_request_id(method=request.method, path=request.path, user_id=user_id)
+    else:
+        try:
+            yield get_request_id(request)
+        except ValueError:
+            pass
+    yield get_request_id(request, without_user_id=True)
+
+
+def is_stale(cached):
+    return cached.get("catalog", False) and cached.catalog_version != CATALOG.version
+
+
+async def get_cached_response(request, context, user_id=None):
+    query_string = request.query_string
+    for request_id in candidate_request_ids(request, user_id):
+        variants = context.responses.get(request_id)
+        cached = variants.get(query_string) if variants is not None else None
+        if cached and is_stale(cached):
+            variants.pop(query_string)
+            cached = None
+        if cached:
+            return cached
+
+        if context.shared.redis:
+            cached = await fetch_shared(context.shared.redis, request_id, query_string)
+            if not cached or is_stale(cached):
+                continue
+
+            ttl = cached.max_age
+            if cached.expires_at:
+                ttl = cached.expires_at - time.time()
+                if ttl <= 0:
+                    await context.shared.redis.hdel(
+                        response_key(request_id), query_string
+                    )
+                    continue
+
+            store_local(context.responses, request_id, query_string, cached, ttl=ttl)
+            return cached
+    return None
+
+
+def cached_response(request, cached):
+    headers = dict(cached.headers)
+    if cached.expires_at:
+        headers["Cache-Control"] = get_cache_control_header(
+            addict.Dict(
+                max_age=max(cached.expires_at - time.time(), 0),
+                without_user_id=cached.without_user_id,
+            )
+        )
+
+    etag = headers.get("ETag")
+    if etag and request.headers.get("If-None-Match") == etag:
+        return text("", headers=headers, status=304)
+    return HTTPResponse(
+        body_bytes=cached.body, headers=headers, content_type=cached.content_type
+    )
+
+
+def start_invalidation_listener(context):
+    listener = context.invalidation_listener
+    if context.shared.redis and (not listener or listener.done()):
+        context.invalidation_listener = asyncio.ensure_future(
+            listen_for_invalidations(context)
+        )
+
+
+@cache_control.middleware(
+    priority=PRIORITY.request.check_cached_response,
+    with_context=True,
+    relative="pre",
+)
+async def check_cached_response(request, context):
+    if request.method != "GET" or not context.shared.redis:
+        return
+
+    user_id = await cached_user_id(request, context.shared.redis)
+    if not user_id:
+        return
+
+    start_invalidation_listener(context)
+    request["response_cache_checked"] = True
+    cached = await get_cached_response(request, context, user_id=user_id)
+    if cached:
+        return cached_response(request, cached)
+
+
 @cache_control.middleware(
     priority=PRIORITY.request.check_etag, with_context=True, relative="post"
 )
 async def check_etag(request, context):
-    if request.method == "OPTIONS":
+    if request.method != "GET" or request.get("response_cache_checked"):
+        return
+    if is_blend_request(request):
         return
 
-    etag = request.headers.get("If-None-Match")
-    if etag:
-        request_id = get_request_id(request)
-        if request_id in context.responses and etag in context.responses[request_id]:
-            return text("", headers=context.responses[request_id][etag], status=304)
+    start_invalidation_listener(context)
+    cached = await get_cached_response(request, context)
+    if cached:
+        return cached_response(request, cached)
 
 
 def get_cache_control_header(cache):
@@ -61,9 +212,9 @@ def get_cache_control_header(cache):
     relative="post",
 )
 async def cache_response(request, response, context):
-    cache, invalidate = None, None
+    cache, invalidations = None, None
     try:
-        invalidate = response.__invalidate__
+        invalidations = response.__invalidate__
         cache = response.__cache__
         if cache is True:
             cache = addict.Dict(without_user_id=False)
@@ -75,9 +226,10 @@ async def cache_response(request, response, context):
 
         return response
 
-    if invalidate:
-        for inv in invalidate:
-            context.responses.pop(get_request_id(**inv), None)
+    if invalidations:
+        await asyncio.gather(
+            *[invalidate(context, get_request_id(**inv)) for inv in invalidations]
+        )
 
     if cache:
         try:
@@ -85,15 +237,38 @@ async def cache_response(request, response, context):
         except ValueError:
             return response
 
-        etag = generate_etag()
+        body = request.get("uncompressed_body", response.body)
         cache_headers = {"Cache-Control": get_cache_control_header(cache)}
         if not cache.without_etag:
-            context.responses[request_id][etag] = cache_headers
-            cache_headers["ETag"] = etag
+            cache_headers["ETag"] = generate_etag(body)
 
-        response.headers.update(cache_headers)
+        if response.status == 200 and not is_blend_request(request):
+            cached = addict.Dict(
+                max_age=cache.max_age or None,
+                expires_at=time.time() + cache.max_age if cache.max_age else None,
+                without_user_id=bool(cache.without_user_id),
+                headers=cache_headers,
+                body=body,
+                content_type=response.content_type,
+                catalog=bool(cache.catalog),
+                catalog_version=CATALOG.version,
+            )
+            store_local(
+                context.responses,
+                request_id,
+                request.query_string,
+                cached,
+                ttl=cached.max_age,
+            )
+            if context.shared.redis:
+                await store_shared(
+                    context.shared.redis,
+                    request_id,
+                    request.query_string,
+                    cached,
+                    ttl=cached.max_age,
+                )
 
-    if len(context.responses) > 20:
-        context.responses.clear()
+        response.headers.update(cache_headers)
 
     return response
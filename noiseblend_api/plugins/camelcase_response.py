@@ -1,10 +1,9 @@
 from inspect import isawaitable
 
-from sanic.response import HTTPResponse, json
+from sanic.response import BaseHTTPResponse, json
 from spf import SanicPlugin
-from stringcase import camelcase
 
-from ..transform import transform_datetime, transform_keys, transform_values
+from ..transform import transform_response
 from .priority import PRIORITY
 
 
@@ -24,7 +23,7 @@ camelcase_response = CamelcaseResponse()
 async def snakecase_to_camelcase(request, response):
     if request.method == "OPTIONS":
         return response
-    if isinstance(response, HTTPResponse):
+    if isinstance(response, BaseHTTPResponse):
         return response
 
     cache, invalidate = None, None
@@ -40,9 +39,7 @@ async def snakecase_to_camelcase(request, response):
         response = response["__response__"]
 
     initial_response = response
-    response = json(
-        transform_values(transform_keys(response, camelcase), transform_datetime)
-    )
+    response = json(transform_response(response))
     response.__cache__ = cache
     response.__invalidate__ = invalidate
     response.__initial__ = initial_response
@@ -7,10 +7,11 @@ PRIORITY = Dict(
             "camelcase_to_snakecase": 1,
             "add_redis_pool": 2,
             "add_db_pool": 2,
-            "add_spotify_client": 3,
-            "authorize_request": 4,
-            "add_arq_actors": 5,
-            "check_etag": 7,
+            "check_cached_response": 3,
+            "add_spotify_client": 4,
+            "authorize_request": 5,
+            "add_arq_actors": 6,
+            "check_etag": 8,
         },
         "response": {
             "snakecase_to_camelcase": 0,
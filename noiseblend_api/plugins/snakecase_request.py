@@ -1,8 +1,7 @@
 from sanic.request import RequestParameters
 from spf import SanicPlugin
-from stringcase import snakecase
 
-from ..transform import transform_keys
+from ..transform import SnakecaseMapping, snakecase_key, transform_keys
 from .priority import PRIORITY
 
 
@@ -20,9 +19,13 @@ async def camelcase_to_snakecase(request):
         return
 
     if request.args:
-        request.parsed_args = RequestParameters(transform_keys(request.args, snakecase))
+        request.parsed_args = RequestParameters(
+            transform_keys(request.args, snakecase_key)
+        )
     try:
-        if request.json:
-            request.parsed_json = transform_keys(request.json, snakecase)
+        if isinstance(request.json, dict):
+            request.parsed_json = SnakecaseMapping(request.json)
+        elif request.json:
+            request.parsed_json = transform_keys(request.json, snakecase_key)
     except:
         pass
@@ -1,6 +1,6 @@
 import asyncio
 import uuid
-from collections import OrderedDict
+from hashlib import sha1
 
 import addict
 import aioredis
@@ -8,21 +8,41 @@ from sanic.exceptions import Unauthorized
 from spf import SanicPlugin
 
 from .. import config, logger
-from ..cache import async_lru
-from ..overrides import AppSpotify
+from ..cache import LRUCache, async_lru
+from ..helpers import listen_for_dislike_invalidations
+from ..overrides import AppSpotify, close_session, close_unused_session
 from ..sql import SQL
 from .priority import PRIORITY
 
+CLIENT_CACHE = LRUCache(
+    size=config.cache.clients.size or 1000,
+    ttl=config.cache.clients.ttl or 3600,
+    sliding=True,
+)
+
+
+TOKEN_USERS_TTL = config.cache.tokens.ttl or 300
+TOKEN_USERS = LRUCache(size=config.cache.tokens.size or 10000, ttl=TOKEN_USERS_TTL)
+
+
+def client_key(auth_token=None, query_token=None, blend_token=None, **_kwargs):
+    return (auth_token, query_token, blend_token)
+
 
-async def close_session(spotify):
-    if spotify.session:
-        await spotify.session.close()
+def token_hash(key):
+    return sha1(str(key).encode()).hexdigest()
 
 
-CLIENT_CACHE = OrderedDict()
+def token_user_key(key):
+    return f"noiseblend:token-user:{token_hash(key)}"
 
 
-@async_lru(size=10, evict_callback=close_session, cache=CLIENT_CACHE)
+@async_lru(
+    key=client_key,
+    evict_callback=close_unused_session,
+    cache=CLIENT_CACHE,
+    single_flight=True,
+)
 async def client(
     auth_token=None, query_token=None, blend_token=None, redis=None, dbpool=None
 ):
@@ -37,29 +57,23 @@ async def client(
         queries.append(dbpool.fetchrow(SQL.app_user_auth, query_token))
 
     if auth_token:
-        queries += [
-            dbpool.fetchrow(SQL.app_user_auth, auth_token),
-            dbpool.fetchrow(SQL.app_user_auth_long_lived, auth_token),
-            dbpool.fetchrow(SQL.app_user_by_token, auth_token),
-            dbpool.fetchval(SQL.oauth_token_expired, auth_token),
-        ]
-
-    result = None
-    for query_future in asyncio.as_completed(queries):
-        result = await query_future
-        if result is True:
+        queries.append(dbpool.fetchrow(SQL.token_auth, auth_token))
+
+    for result in await asyncio.gather(*queries):
+        if not result:
+            continue
+        if "user" in result:
+            blend = addict.Dict(dict(result))
+        elif result.get("expired"):
             raise Unauthorized(
                 "The access token expired",
                 scheme="Bearer",
                 error="invalid_token",
                 error_description="The access token expired",
             )
-        if result:
-            if "user" in result:
-                blend = addict.Dict(dict(result))
-            else:
-                app_user = result
-            break
+        else:
+            app_user = result
+        break
 
     user_id, username = None, None
     if app_user:
@@ -89,6 +103,7 @@ class SpotifyClient(SanicPlugin):
 
     def on_registered(self, context, reg, *args, **kwargs):
         context.shared.redis = None
+        context.dislikes_listener = None
 
 
 spotify_client = SpotifyClient()
@@ -110,32 +125,30 @@ async def add_redis_pool(request, context):
             maxsize=REDIS.pool.maxsize or 10,
         )
 
+    listener = context.dislikes_listener
+    if not listener or listener.done():
+        context.dislikes_listener = asyncio.ensure_future(
+            listen_for_dislike_invalidations(context.shared.redis)
+        )
+
 
-def create_client_invalidation(key, cache, _client):
+def create_client_invalidation(key, cache, _client, redis=None):
     async def invalidate_client():
         cache.pop(key, None)
+        TOKEN_USERS.pop(token_hash(key), None)
+        if redis:
+            await redis.delete(token_user_key(key))
         await close_session(_client)
 
     return invalidate_client
 
 
-@spotify_client.middleware(
-    priority=PRIORITY.request.add_spotify_client, with_context=True
-)
-async def add_spotify_client(request, context):
-    if request.method == "OPTIONS":
-        return
-
-    ctx = context.shared.request[id(request)]
+def request_tokens(request):
     query_token = (
         request.headers.get("Token")
         or request.args.get("token")
         or request.cookies.get("authToken")
     )
-    blend_token = request.headers.get("BlendToken")
-    if blend_token and request.path not in BLEND_PATHS:
-        raise Unauthorized("Authentication required", scheme="Bearer")
-
     try:
         auth_token = str(uuid.UUID(request.token))
     except:
@@ -145,21 +158,55 @@ async def add_spotify_client(request, context):
     except:
         query_token = None
 
-    logger.debug(
-        "Getting Spotify client for auth_token=%s, query_token=%s, blend_token=%s",
-        auth_token,
-        query_token,
-        blend_token,
-    )
-    client_args = {
+    return {
         "auth_token": auth_token,
         "query_token": query_token,
-        "blend_token": blend_token,
-        "redis": context.shared.redis,
-        "dbpool": context.shared.dbpool,
+        "blend_token": request.headers.get("BlendToken"),
     }
-    ctx.spotify = await client(**client_args)
+
+
+async def cached_user_id(request, redis):
+    tokens = request_tokens(request)
+    if tokens["blend_token"] or not (tokens["auth_token"] or tokens["query_token"]):
+        return None
+    return await redis.get(token_user_key(client_key(**tokens)), encoding="utf-8")
+
+
+async def remember_token_user(redis, key, user_id):
+    user_id = str(user_id)
+    if TOKEN_USERS.get(token_hash(key)) == user_id:
+        return
+    if redis:
+        await redis.setex(token_user_key(key), TOKEN_USERS_TTL, user_id)
+    TOKEN_USERS.set(token_hash(key), user_id)
+
+
+@spotify_client.middleware(
+    priority=PRIORITY.request.add_spotify_client, with_context=True
+)
+async def add_spotify_client(request, context):
+    if request.method == "OPTIONS":
+        return
+
+    ctx = context.shared.request[id(request)]
+    tokens = request_tokens(request)
+    if tokens["blend_token"] and request.path not in BLEND_PATHS:
+        raise Unauthorized("Authentication required", scheme="Bearer")
+
+    logger.debug(
+        "Getting Spotify client for auth_token=%s, query_token=%s, blend_token=%s",
+        tokens["auth_token"],
+        tokens["query_token"],
+        tokens["blend_token"],
+    )
+    key = client_key(**tokens)
+    ctx.spotify = await client(
+        **tokens, redis=context.shared.redis, dbpool=context.shared.dbpool
+    )
+    if ctx.spotify.user_id and ctx.spotify.is_authenticated and not ctx.spotify.blend:
+        await remember_token_user(context.shared.redis, key, ctx.spotify.user_id)
+
     request["spotify"] = ctx.spotify
     request["invalidate_client"] = create_client_invalidation(
-        str(((), client_args)), CLIENT_CACHE, ctx.spotify
+        key, CLIENT_CACHE, ctx.spotify, redis=context.shared.redis
     )
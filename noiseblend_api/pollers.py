@@ -0,0 +1,129 @@
+import asyncio
+
+import ujson
+
+from . import config, logger
+from .helpers import get_devices_and_playback
+from .transform import camelcase_key, merge_diff, transform_keys
+
+MIN_POLLING = 2
+MAX_FAILURES = config.api.devices.max_failures or 5
+
+
+def publish(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class StateSender:
+    def __init__(self, ws, diff=False):
+        self.ws = ws
+        self.diff = diff
+        self.last = None
+
+    async def send(self, data, message=None):
+        if self.diff and self.last is not None:
+            patch = merge_diff(self.last, data)
+            if patch:
+                await self.ws.send(ujson.dumps({"patch": patch}))
+        else:
+            await self.ws.send(message or ujson.dumps(data))
+        self.last = data
+
+
+class DevicePoller:
+    pollers = {}
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.subscribers = {}
+        self.clients = {}
+        self.message = None
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    @classmethod
+    def for_user(cls, spotify):
+        poller = cls.pollers.get(spotify.user_id)
+        if not poller:
+            poller = cls.pollers[spotify.user_id] = cls(spotify.user_id)
+        return poller
+
+    @property
+    def polling(self):
+        return max(min(self.subscribers.values()), MIN_POLLING)
+
+    @property
+    def spotify(self):
+        return list(self.clients.values())[-1]
+
+    def subscribe(self, spotify, polling):
+        queue = asyncio.Queue(maxsize=1)
+        self.clients[queue] = spotify
+        if self.message is not None:
+            publish(queue, self.message)
+
+        self.update(queue, polling)
+        if not self.task:
+            self.task = asyncio.ensure_future(self.run())
+        return queue
+
+    def update(self, queue, polling):
+        old_polling = self.polling if self.subscribers else None
+        self.subscribers[queue] = polling
+        if old_polling is not None and self.polling < old_polling:
+            self.wakeup.set()
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+        self.clients.pop(queue, None)
+        if self.subscribers:
+            return
+
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        self.discard()
+
+    def discard(self):
+        if self.pollers.get(self.user_id) is self:
+            del self.pollers[self.user_id]
+
+    def stop(self):
+        logger.warning(
+            "Stopping device poller for %s after %s failures",
+            self.user_id,
+            MAX_FAILURES,
+        )
+        self.discard()
+        for queue in self.subscribers:
+            publish(queue, None)
+        self.subscribers.clear()
+        self.clients.clear()
+        self.task = None
+
+    async def run(self):
+        failures = 0
+        while self.subscribers:
+            try:
+                data = transform_keys(
+                    await get_devices_and_playback(self.spotify), camelcase_key
+                )
+                failures = 0
+                if self.message is None or self.message[0] != data:
+                    self.message = (data, ujson.dumps(data))
+                for queue in self.subscribers:
+                    publish(queue, self.message)
+            except Exception as exc:
+                logger.exception(exc)
+                failures += 1
+                if failures >= MAX_FAILURES:
+                    self.stop()
+                    return
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.polling)
+            except asyncio.TimeoutError:
+                pass
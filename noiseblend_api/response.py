@@ -1,12 +1,96 @@
+import zlib
 from typing import Any
 
-from sanic.response import HTTPResponse, json
-from stringcase import camelcase
+import ujson
+from sanic.response import HTTPResponse, json, stream
 
-from .transform import transform_datetime, transform_keys, transform_values
+from . import config
+from .transform import transform_response
+
+STREAM_PLACEHOLDER = "__stream__"
+PLAYLIST_ITEMS = ("tracks", "items")
+STREAM_THRESHOLD = config.api.stream.threshold or 500
+STREAM_CHUNK_SIZE = config.api.stream.chunk_size or 100
 
 
 def camelcase_json(response: Any) -> HTTPResponse:
-    return json(
-        transform_values(transform_keys(response, camelcase), transform_datetime)
+    return json(transform_response(response))
+
+
+def get_path(obj, path):
+    for key in path:
+        obj = obj[key]
+    return obj
+
+
+def split_payload(payload, path):
+    *parents, leaf = path
+    root = dict(payload)
+    node = root
+    for key in parents:
+        node[key] = dict(node[key])
+        node = node[key]
+    items = node[leaf]
+    node[leaf] = STREAM_PLACEHOLDER
+
+    prefix, suffix = ujson.dumps(transform_response(root)).split(
+        f'"{STREAM_PLACEHOLDER}"', 1
     )
+    return prefix, items, suffix
+
+
+def encode_chunk(chunk):
+    return ujson.dumps(transform_response(chunk))[1:-1]
+
+
+def encode_chunks(items, chunk_size):
+    is_mapping = isinstance(items, dict)
+    items = list(items.items() if is_mapping else items)
+
+    yield "{" if is_mapping else "["
+    for i in range(0, len(items), chunk_size):
+        chunk = items[i : i + chunk_size]
+        separator = "," if i else ""
+        yield separator + encode_chunk(dict(chunk) if is_mapping else chunk)
+    yield "}" if is_mapping else "]"
+
+
+def should_stream(payload, path=()):
+    try:
+        return len(get_path(payload, path)) >= STREAM_THRESHOLD
+    except (KeyError, TypeError):
+        return False
+
+
+def stream_camelcase_json(request, payload, path=(), max_age=None):
+    if path:
+        prefix, items, suffix = split_payload(payload, path)
+    else:
+        prefix, items, suffix = "", payload, ""
+
+    headers = {}
+    if max_age:
+        headers["Cache-Control"] = f"max-age={int(max_age)}"
+
+    compressor = None
+    if "gzip" in request.headers.get("Accept-Encoding", "").lower():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+
+    async def write(response, data):
+        data = data.encode()
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            await response.write(data)
+
+    async def streaming_fn(response):
+        await write(response, prefix)
+        for chunk in encode_chunks(items, STREAM_CHUNK_SIZE):
+            await write(response, chunk)
+        await write(response, suffix)
+        if compressor:
+            await response.write(compressor.flush())
+
+    return stream(streaming_fn, headers=headers, content_type="application/json")
@@ -12,41 +12,48 @@ class SQL:
             valid AND
             expires_at > (now() at time zone 'utc')
     """
-    oauth_token_expired = """
-        SELECT (t.expires_at <= (now() at time zone 'utc')) AS expired
-        FROM users u
-            INNER JOIN tokens t
-            ON u.id = t."user"
-        WHERE
-            t.id = $1 AND
-            t.valid
-    """
-    app_user_by_token = """
-        SELECT au.id, u.username
-        FROM app_users au
-            INNER JOIN tokens t ON au.id = t."user"
+    token_auth = """
+        SELECT id, username, expired FROM (
+            SELECT au.id, u.username, FALSE AS expired, 1 AS priority
+            FROM app_users au
             INNER JOIN users u ON u.id = au.id
-        WHERE
-            t.id = $1 AND
-            t.valid AND
-            t.expires_at > (now() at time zone 'utc')
-    """
-    map_device = """
-        UPDATE app_users
-        SET device_mapping = (device_mapping || $1)
-        WHERE id = $2"""
+            WHERE au.auth_token = $1
+            UNION ALL
+            SELECT au.id, u.username, FALSE AS expired, 2 AS priority
+            FROM app_users au
+            INNER JOIN users u ON u.id = au.id
+            WHERE au.long_lived_token IS NOT NULL AND au.long_lived_token = $1
+            UNION ALL
+            SELECT
+                au.id, u.username,
+                (t.expires_at <= (now() at time zone 'utc')) AS expired,
+                3 AS priority
+            FROM app_users au
+                INNER JOIN tokens t ON au.id = t."user"
+                INNER JOIN users u ON u.id = au.id
+            WHERE
+                t.id = $1 AND
+                t.valid
+        ) matches
+        ORDER BY priority
+        LIMIT 1
+    """
+    map_devices = """
+        UPDATE app_users au
+        SET device_mapping = (au.device_mapping || m.mapping::jsonb)
+        FROM unnest($1::uuid[], $2::text[]) AS m(id, mapping)
+        WHERE au.id = m.id"""
     user_artist_time_range = "SELECT artist_time_range FROM app_users WHERE id = $1"
     user_genre_time_range = "SELECT genre_time_range FROM app_users WHERE id = $1"
     user_country = "SELECT country, preferred_country FROM users WHERE id = $1"
-    disliked_artists = """
-        SELECT artist
-        FROM artist_haters
-        WHERE "user" = $1
-    """
-    disliked_genres = """
-        SELECT genre
-        FROM genre_haters
-        WHERE "user" = $1
+    user_dislikes = """
+        SELECT 'artists', artist FROM artist_haters WHERE "user" = $1
+        UNION ALL
+        SELECT 'genres', genre FROM genre_haters WHERE "user" = $1
+        UNION ALL
+        SELECT 'countries', country FROM country_haters WHERE "user" = $1
+        UNION ALL
+        SELECT 'cities', city FROM city_haters WHERE "user" = $1
     """
     user_data = """
         SELECT u.*, au.*,
@@ -66,11 +73,6 @@ class SQL:
         FROM app_users au
         INNER JOIN users u ON u.id = au.id
         WHERE au.auth_token = $1"""
-    app_user_auth_long_lived = """
-        SELECT au.id, u.username
-        FROM app_users au
-        INNER JOIN users u ON u.id = au.id
-        WHERE au.long_lived_token IS NOT NULL AND au.long_lived_token = $1"""
     blend_auth = """
         SELECT b.*, u.username
         FROM blends b
@@ -100,104 +102,26 @@ class SQL:
         ON CONFLICT DO NOTHING
         RETURNING token
     """
-    genre_playlists = """
-        SELECT p.*
-        FROM playlists p
-        WHERE p.genre = ANY($1::text[])
-    """
-    country_playlists = """
-        SELECT p.*
-        FROM playlists p
-        WHERE
-            p.country = ANY($1::text[]) AND
-            p.city IS NULL AND
-            p.date IS NULL
-    """
-    city_playlists = """
-        SELECT p.*
-        FROM playlists p
-        WHERE
-            p.country = $2 AND
-            p.city IS NOT NULL AND
-            p.city = ANY($1::text[])
-    """
-    country_playlists_ignore = """
-        SELECT p.*
-        FROM playlists p
-        WHERE
-            p.country <> ALL($1::text[]) AND
-            p.city IS NULL AND
-            p.date IS NULL AND
-            p.country NOT IN (
-                SELECT country
-                FROM country_haters
-                WHERE "user" = $4
-            )
-    """
-    city_playlists_ignore = """
-        SELECT p.*
-        FROM playlists p
-        WHERE
-            p.country = $4 AND
-            p.city IS NOT NULL AND
-            p.city <> ALL($1::text[]) AND
-            p.city NOT IN (
-                SELECT city
-                FROM city_haters
-                WHERE "user" = $5
-            )
-    """
-    item_playlists = """
-        WITH
-            {singular}_playlists AS ({playlist_query}),
-            wanted_{plural} AS (
-                SELECT {singular}
-                FROM {singular}_playlists pls
-                GROUP BY {singular}
-                ORDER BY random()
-                LIMIT {limit}),
-            {singular}_images AS (
-                SELECT i.url, i.color, i.{singular},
-                    i.unsplash_user_fullname, i.unsplash_user_username
-                FROM images i
-                WHERE i.{singular} IN (SELECT {singular} FROM wanted_{plural}) AND (
-                        (i.width >= $2) OR
-                        (i.height >= $3)
-                    ))
-        SELECT DISTINCT ON (pls.id) pls.*,
-            json_build_object(
-                'url', gi.url, 'color', gi.color,
-                'unsplash_user_fullname', gi.unsplash_user_fullname,
-                'unsplash_user_username', gi.unsplash_user_username
-            ) AS image
-        FROM {singular}_playlists pls
-        LEFT OUTER JOIN {singular}_images gi ON gi.{singular} = pls.{singular}
-        WHERE pls.{singular} IN (SELECT {singular} FROM wanted_{plural})
-        ORDER BY pls.id
+    audio_features = "SELECT * FROM audio_features WHERE id = ANY($1::text[])"
+    insert_audio_features = """
+        INSERT INTO audio_features (
+            id, acousticness, danceability, duration_ms, energy,
+            instrumentalness, key, liveness, loudness, mode,
+            speechiness, tempo, time_signature, valence
+        )
+        SELECT * FROM unnest(
+            $1::text[], $2::float8[], $3::float8[], $4::int[], $5::float8[],
+            $6::float8[], $7::int[], $8::float8[], $9::float8[], $10::bool[],
+            $11::float8[], $12::float8[], $13::int[], $14::float8[]
+        )
+        ON CONFLICT DO NOTHING
     """
-    all_item_playlists = """
-        WITH
-            {singular}_playlists AS ({playlist_query}),
-            wanted_{plural} AS (
-                SELECT {singular}
-                FROM {singular}_playlists pls
-                GROUP BY {singular}),
-            {singular}_images AS (
-                SELECT i.url, i.color, i.{singular},
-                    i.unsplash_user_fullname, i.unsplash_user_username
-                FROM images i
-                WHERE i.{singular} IN (SELECT {singular} FROM wanted_{plural}) AND (
-                        (i.width >= $2) OR
-                        (i.height >= $3)
-                    ))
-        SELECT DISTINCT ON (pls.id) pls.*,
-            json_build_object(
-                'url', gi.url, 'color', gi.color,
-                'unsplash_user_fullname', gi.unsplash_user_fullname,
-                'unsplash_user_username', gi.unsplash_user_username
-            ) AS image
-        FROM {singular}_playlists pls
-        LEFT OUTER JOIN {singular}_images gi ON gi.{singular} = pls.{singular}
-        WHERE pls.{singular} IN (SELECT {singular} FROM wanted_{plural})
-        ORDER BY pls.id
+    catalog_playlists = "SELECT * FROM playlists"
+    catalog_countries = "SELECT * FROM countries ORDER BY name"
+    catalog_images = """
+        SELECT genre, country, city, url, color, width, height,
+            unsplash_user_fullname, unsplash_user_username
+        FROM images
+        WHERE genre IS NOT NULL OR country IS NOT NULL OR city IS NOT NULL
+        ORDER BY width
     """
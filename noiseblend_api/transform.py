@@ -1,6 +1,21 @@
+from collections.abc import MutableMapping
 from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain
 from typing import Any, Callable
 
+from stringcase import camelcase, snakecase
+
+
+@lru_cache(maxsize=8192)
+def camelcase_key(key):
+    return camelcase(key)
+
+
+@lru_cache(maxsize=8192)
+def snakecase_key(key):
+    return snakecase(key)
+
 
 def transform_datetime(value):
     if isinstance(value, (date, datetime)):
@@ -40,3 +55,78 @@ def transform_values(obj: Any, transform: Callable[[str], str]) -> Any:
         return transformed
 
     return obj
+
+
+def transform_response(
+    obj: Any, transform: Callable[[str], str] = camelcase_key
+) -> Any:
+    if isinstance(obj, dict):
+        return {
+            transform(key): transform_response(value, transform)
+            for key, value in obj.items()
+        }
+
+    if isinstance(obj, (list, tuple, set)):
+        return [transform_response(item, transform) for item in obj]
+
+    return transform_datetime(obj)
+
+
+def merge_diff(old: Any, new: Any) -> Any:
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return new
+
+    patch = {key: None for key in old.keys() - new.keys()}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = merge_diff(old[key], value)
+    return patch
+
+
+def snakecase_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        return transform_keys(value, snakecase_key)
+
+    if isinstance(value, (list, tuple, set)) and any(
+        isinstance(item, (dict, list, tuple, set)) for item in value
+    ):
+        return transform_keys(value, snakecase_key)
+
+    return value
+
+
+class SnakecaseMapping(MutableMapping):
+    def __init__(self, data):
+        self.pending = {snakecase_key(key): value for key, value in data.items()}
+        self.converted = {}
+
+    def __getitem__(self, key):
+        try:
+            return self.converted[key]
+        except KeyError:
+            pass
+
+        value = snakecase_value(self.pending.pop(key))
+        self.converted[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        self.pending.pop(key, None)
+        self.converted[key] = value
+
+    def __delitem__(self, key):
+        if key in self.converted:
+            del self.converted[key]
+        else:
+            del self.pending[key]
+
+    def __iter__(self):
+        return chain(list(self.converted), list(self.pending))
+
+    def __len__(self):
+        return len(self.converted) + len(self.pending)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({dict(self)})"
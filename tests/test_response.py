@@ -0,0 +1,63 @@
+import ujson
+from sanic import Sanic
+from spf import SanicPluginsFramework
+
+from noiseblend_api.compress import AppCompress
+from noiseblend_api.plugins.camelcase_response import camelcase_response
+from noiseblend_api.response import stream_camelcase_json
+
+TRACKS = [{"track_name": f"Track {i}", "duration_ms": i} for i in range(1000)]
+
+
+def create_app():
+    app = Sanic("test_response")
+    AppCompress(app)
+    spf = SanicPluginsFramework(app)
+    spf.register_plugin(camelcase_response)
+
+    @app.get("/stream")
+    async def stream_tracks(request):
+        return stream_camelcase_json(
+            request, {"playlist_name": "Test", "tracks": TRACKS}, path=("tracks",)
+        )
+
+    @app.get("/json")
+    async def json_tracks(_request):
+        return {"playlist_name": "Test", "tracks": TRACKS}
+
+    return app, spf
+
+
+def test_streamed_response_passes_through_middleware():
+    app, spf = create_app()
+
+    for encoding in ("gzip", "identity"):
+        request, response = app.test_client.get(
+            "/stream", headers={"Accept-Encoding": encoding}
+        )
+
+        assert response.status == 200
+        assert (response.headers.get("Content-Encoding") == "gzip") == (
+            encoding == "gzip"
+        )
+        assert ujson.loads(response.text) == {
+            "playlistName": "Test",
+            "tracks": [
+                {"trackName": t["track_name"], "durationMs": t["duration_ms"]}
+                for t in TRACKS
+            ],
+        }
+        assert id(request) not in spf.shared_context.get("request", {})
+
+
+def test_json_response_is_compressed_once():
+    app, spf = create_app()
+
+    request, response = app.test_client.get(
+        "/json", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.status == 200
+    assert response.headers.get("Content-Encoding") == "gzip"
+    assert ujson.loads(response.text)["playlistName"] == "Test"
+    assert id(request) not in spf.shared_context.get("request", {})